@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Compares histo.clone with the previous clone, which constructed
+a new histo and decorated it from the original.
+
+Usage: python3 benchmarks/bench_clone.py [nClones] [nRepeats]
+"""
+
+from plotter import histo
+import ROOT
+import sys
+import timeit
+
+
+def old_clone(h: histo, th_suffix: str) -> histo:
+    hname = h.title + "_" + th_suffix
+    c = histo(h.title, h.th.Clone(hname))
+    c.decorate(h)
+    return c
+
+
+def main(nClones: int, nRepeats: int) -> None:
+    th = ROOT.TH1D("bench", "bench", 100, 0, 100)
+    th.FillRandom("gaus", 10000)
+    h = histo("bench", th, linecolor=ROOT.kBlue, fillcolor=ROOT.kRed, drawoption="hist")
+
+    # both clones have to look the same
+    fast = h.clone("fast")
+    slow = old_clone(h, "slow")
+    assert fast.decorators == slow.decorators
+    assert fast.th.GetTitle() == slow.th.GetTitle()
+
+    # best of the repeats, the others are disturbed by other processes
+    tOld = min(timeit.repeat(lambda: old_clone(h, "slow"), number=nClones, repeat=nRepeats))
+    tNew = min(timeit.repeat(lambda: h.clone("fast"), number=nClones, repeat=nRepeats))
+    print(f"{nClones} clones, best of {nRepeats}, ROOT {ROOT.gROOT.GetVersion()}")
+    print(f"  construct + decorate: {tOld * 1e6 / nClones:8.1f} us/clone")
+    print(f"  histo.clone:          {tNew * 1e6 / nClones:8.1f} us/clone")
+    print(f"  speedup:              {tOld / tNew:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    )
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Measures import time of plotter modules, each in a fresh interpreter.
+Modules which do not need ROOT should import in milliseconds,
+ROOT is imported only on first access to e.g. plotter.histo.
+
+Usage: python3 benchmarks/bench_import.py [nRepeats]
+"""
+
+import subprocess
+import sys
+
+STATEMENTS = [
+    "from plotter import xsReader",
+    "from plotter import pdgRounding",
+    "from plotter import loader",
+    "from plotter import npHisto",
+    "from plotter import dataset, collection",
+    "import ROOT",
+    "from plotter import histo",
+]
+
+_SCRIPT = """
+import sys, time
+t = time.perf_counter()
+{statement}
+print(time.perf_counter() - t, "ROOT" in sys.modules)
+"""
+
+
+def measure(statement: str, nRepeats: int) -> str:
+    times = []
+    for _ in range(nRepeats):
+        result = subprocess.run(
+            [sys.executable, "-c", _SCRIPT.format(statement=statement)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        if result.returncode != 0:
+            return "failed: " + result.stderr.strip().splitlines()[-1]
+        seconds, usesROOT = result.stdout.split()
+        times.append(float(seconds))
+    return f"{min(times) * 1e3:8.1f} ms  (ROOT imported: {usesROOT})"
+
+
+def main(nRepeats: int) -> None:
+    print(f"best of {nRepeats} fresh interpreters")
+    for statement in STATEMENTS:
+        print(f"  {statement:42s} {measure(statement, nRepeats)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
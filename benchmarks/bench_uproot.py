@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Compares reading of histograms written by ROOT with the "root"
+and "uproot" backends of dataset. Before timing, histograms read
+by both backends (1D/2D/3D, variable binning, with and without Sumw2)
+are checked to be the same, including under/overflow, and scaling
+of a read histogram is checked not to change the next read.
+
+Usage: python3 benchmarks/bench_uproot.py [nHistos] [nRepeats]
+"""
+
+from plotter import dataset
+from array import array
+import numpy as np
+import ROOT
+import os
+import sys
+import tempfile
+import timeit
+
+
+def make_histos(nHistos: int) -> list:
+    ROOT.gRandom.SetSeed(1)
+    varBins = array("d", [-3, -1, -0.5, 0, 0.5, 1, 3])
+    shapes = [
+        lambda name: ROOT.TH1D(name, name, 100, -3, 3),
+        lambda name: ROOT.TH1F(name, name, 6, varBins),
+        lambda name: ROOT.TH2D(name, name, 20, -3, 3, 6, varBins),
+        lambda name: ROOT.TH3D(name, name, 10, -3, 3, 10, -3, 3, 10, -3, 3),
+    ]
+    ths = []
+    for i in range(nHistos):
+        th = shapes[i % len(shapes)](f"h{i}")
+        th.SetDirectory(ROOT.nullptr)
+        # every 5th histogram without Sumw2, errors are sqrt of contents
+        th.Sumw2(i % 5 != 0)
+        for _ in range(1000):
+            args = [ROOT.gRandom.Gaus() * 1.5 for _ in range(th.GetDimension())]
+            th.Fill(*args, ROOT.gRandom.Uniform(0.5, 2) if i % 5 != 0 else 1)
+        ths.append(th)
+    return ths
+
+
+def same(a, b) -> bool:
+    return (
+        len(a.edges) == len(b.edges)
+        and all(np.array_equal(x, y) for x, y in zip(a.edges, b.edges))
+        and np.allclose(a.sumw, b.sumw)
+        and np.allclose(a.sumw2, b.sumw2)
+        and (a.name, a.title, a.entries) == (b.name, b.title, b.entries)
+    )
+
+
+def main(nHistos: int, nRepeats: int) -> None:
+    ths = make_histos(nHistos)
+    names = [th.GetName() for th in ths]
+    path = os.path.join(tempfile.mkdtemp(), "bench_uproot.root")
+    tFile = ROOT.TFile(path, "RECREATE")
+    for th in ths:
+        tFile.WriteObject(th, th.GetName())
+    tFile.Close()
+
+    dsROOT = dataset("root", path, backend="root")
+    dsUproot = dataset("uproot", path, backend="uproot")
+
+    # both backends have to read the same histograms
+    for name in names:
+        assert same(dsROOT.get_np(name), dsUproot.get_np(name)), name
+
+    # npHisto is modified in place (e.g. normalization),
+    # reading the histogram again must not see the change
+    for ds in (dsROOT, dsUproot):
+        first = ds.get_np(names[0])
+        expected = first.sumw.copy()
+        first.scale(10)
+        assert np.array_equal(ds.get_np(names[0]).sumw, expected), ds.name
+
+    def read(ds: dataset) -> None:
+        for name in names:
+            ds.get_np(name)
+
+    tROOT = min(timeit.repeat(lambda: read(dsROOT), number=1, repeat=nRepeats))
+    tUproot = min(timeit.repeat(lambda: read(dsUproot), number=1, repeat=nRepeats))
+    print(f"{nHistos} histograms, best of {nRepeats}, ROOT {ROOT.gROOT.GetVersion()}")
+    print(f"  root backend:   {tROOT * 1e3 / nHistos:8.3f} ms/histo")
+    print(f"  uproot backend: {tUproot * 1e3 / nHistos:8.3f} ms/histo")
+
+    # TFile2 (python subclass of TFile) kept until exit can crash ROOT on teardown
+    for ds in (dsROOT, dsUproot):
+        ds._close()
+    del dsROOT.tFile
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    )
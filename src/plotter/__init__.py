@@ -1,15 +1,81 @@
-from .dataset import dataset  # NOQA
-from .dataset import sumOfWeightHelper  # NOQA
-from .collection import collection, SuperCollection  # NOQA
-from .collection import normalizationHelper  # NOQA
-from .histo import histo  # NOQA
-from .pad import pad  # NOQA
-from .canvas import canvas  # NOQA
-from .legend import legend  # NOQA
-from .xsReader import xsReader  # NOQA
-from . import presets  # NOQA
-from . import loader  # NOQA
-from . import atlas  # NOQA
-from . import thHelper  # NOQA
-from .quiet import Quiet  # NOQA
-from .tfile2 import TFile2  # NOQA
+""" Exported names are imported lazily, on first access
+(e.g. plotter.histo), so that modules which do not need ROOT
+(loader, xsReader, nphisto, ...) can be used without importing it.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+import importlib
+import sys
+import types
+
+# exported name -> (submodule, attribute), attribute None for submodule itself
+_EXPORTS: Dict[str, Tuple[str, Optional[str]]] = {
+    "dataset": ("dataset", "dataset"),
+    "sumOfWeightHelper": ("dataset", "sumOfWeightHelper"),
+    "sowIndex": ("dataset", "sowIndex"),
+    "collection": ("collection", "collection"),
+    "SuperCollection": ("collection", "SuperCollection"),
+    "normalizationHelper": ("collection", "normalizationHelper"),
+    "histoCache": ("cache", "histoCache"),
+    "histo": ("histo", "histo"),
+    "npHisto": ("nphisto", "npHisto"),
+    "lazyHisto": ("lazy", "lazyHisto"),
+    "pad": ("pad", "pad"),
+    "canvas": ("canvas", "canvas"),
+    "wait_for_saves": ("canvas", "wait_for_saves"),
+    "outputWriter": ("output", "outputWriter"),
+    "plotManifest": ("manifest", "plotManifest"),
+    "systematics": ("systematics", "systematics"),
+    "sharedHisto": ("transport", "sharedHisto"),
+    "legend": ("legend", "legend"),
+    "xsReader": ("xsReader", "xsReader"),
+    "presets": ("presets", None),
+    "loader": ("loader", None),
+    "atlas": ("atlas", None),
+    "thHelper": ("thHelper", None),
+    "Quiet": ("quiet", "Quiet"),
+    "TFile2": ("tfile2", "TFile2"),
+}
+
+# submodules which do not import ROOT
+_ROOT_FREE = ("dataset", "collection", "nphisto", "output", "manifest", "loader", "xsReader", "parallel")
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    moduleName, attribute = _EXPORTS[name]
+    if moduleName not in _ROOT_FREE:
+        # global setup of ROOT done by these modules
+        # (batch mode, histograms not added to directories)
+        importlib.import_module(".atlas", __name__)
+        importlib.import_module(".histo", __name__)
+    module = importlib.import_module("." + moduleName, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+class _package(types.ModuleType):
+    """Importing submodule sets it as attribute of the package,
+    which would hide exported class of the same name (e.g. dataset)"""
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # on purpose: keep baseline behavior, plotter.dataset is the class, not the submodule
+        if isinstance(value, types.ModuleType) and _EXPORTS.get(name, ("", None))[1] is not None:
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _package
+
+# module __getattr__ is supported since python 3.7
+if sys.version_info < (3, 7):
+    for _name in _EXPORTS:
+        __getattr__(_name)
@@ -0,0 +1,283 @@
+from . import presets
+from . import atlas
+from .manifest import plotManifest
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import multiprocessing
+import multiprocessing.connection
+import time
+import traceback
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Batch rendering of many plots in parallel processes.
+
+ROOT keeps global state (gPad, gStyle), so plots cannot be safely
+drawn from several threads. Instead, plots are distributed to worker
+processes. Workers are forked, so the plot specifications (including
+collections and lazyHistos) are inherited and do not need to be pickled.
+Forking should be done before ROOT threads are started
+(e.g. before parallel reading of uproot datasets with nThreads > 1).
+
+With a plotManifest, plots whose outputs exist with the same digest
+of inputs (see presets.inputs_digest) are skipped before rendering.
+"""
+
+
+class plotSpec:
+    """Description of a single plot"""
+
+    def __init__(
+        self,
+        preset: str,
+        args: Sequence[Any],
+        outputs: List[str],
+        presetKwargs: Optional[Dict[str, Any]] = None,
+        logyOutputs: Optional[List[str]] = None,
+        decorate: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        """
+        Arguments:
+            preset (``str``): name of the preset class, e.g. "dataMC"
+            args (``Sequence``): arguments of add_and_plot of the preset,
+                histos can be lazyHistos so they are read by the worker
+            outputs (``List[str]``): paths where the plot is saved
+            presetKwargs (``Dict``): arguments of the preset constructor
+            logyOutputs (``List[str]``): paths where the plot is saved
+                after switching to logarithmic y-axis
+            decorate (``Callable``): called with the preset after
+                add_and_plot, e.g. to add labels
+        """
+        self.preset = preset
+        self.args = args
+        self.outputs = outputs
+        self.presetKwargs = presetKwargs if presetKwargs is not None else {}
+        self.logyOutputs = logyOutputs if logyOutputs is not None else []
+        self.decorate = decorate
+
+    @property
+    def name(self) -> str:
+        return (self.outputs + self.logyOutputs + [self.preset])[0]
+
+    @property
+    def allOutputs(self) -> List[str]:
+        return self.outputs + self.logyOutputs
+
+    def digest(self) -> str:
+        """Returns digest of the plot inputs, see presets.inputs_digest"""
+        decorate = None
+        if self.decorate is not None:
+            decorate = f"{self.decorate.__module__}.{self.decorate.__qualname__}"
+        extra = [self.outputs, self.logyOutputs, decorate]
+        return presets.inputs_digest(self.preset, self.presetKwargs, self.args, extra)
+
+    def render(self) -> None:
+        """Builds and saves the plot in the current process"""
+        plot = getattr(presets, self.preset)(**self.presetKwargs)
+        plot.add_and_plot(*self.args)
+        if self.decorate is not None:
+            self.decorate(plot)
+        for output in self.outputs:
+            plot.save(output)
+        if self.logyOutputs:
+            plot.mainPad.logy()
+            for output in self.logyOutputs:
+                plot.save(output)
+
+
+class plotResult:
+    """Outcome of rendering of a single plot"""
+
+    def __init__(
+        self, name: str, seconds: float, error: Optional[str] = None, skipped: bool = False
+    ) -> None:
+        """
+        Arguments:
+            name (``str``): name of the plot (first output)
+            seconds (``float``): time spent on the plot
+            error (``str``): error message if the plot failed
+            skipped (``bool``): True if the plot was not rendered,
+                as its outputs are up to date
+        """
+        self.name = name
+        self.seconds = seconds
+        self.error = error
+        self.skipped = skipped
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# specifications inherited by the forked workers
+_specs: List[plotSpec] = []
+
+
+def _init_worker(atlasStyle: bool) -> None:
+    """Executed once in each worker"""
+    if atlasStyle:
+        atlas.SetAtlasStyle()
+
+
+def _render_one(index: int) -> plotResult:
+    """Renders plot, errors are returned instead of raised"""
+    spec = _specs[index]
+    start = time.perf_counter()
+    try:
+        spec.render()
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return plotResult(spec.name, time.perf_counter() - start, error)
+
+
+class _worker:
+    """Worker process rendering plots it receives through a pipe.
+    Results are sent back synchronously, so when the process crashes
+    the plot it was rendering is known and no other result is lost."""
+
+    def __init__(self, context, atlasStyle: bool) -> None:
+        self.conn, childConn = context.Pipe()
+        self.process = context.Process(target=self._loop, args=(childConn, atlasStyle))
+        self.process.start()
+        childConn.close()
+        self.index: Optional[int] = None
+
+    @staticmethod
+    def _loop(conn, atlasStyle: bool) -> None:
+        _init_worker(atlasStyle)
+        while True:
+            index = conn.recv()
+            if index is None:
+                break
+            conn.send(_render_one(index))
+
+    def submit(self, index: Optional[int]) -> None:
+        self.index = index
+        self.conn.send(index)
+
+    def receive(self) -> Optional[plotResult]:
+        """Returns result of the current plot, None if the worker crashed"""
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join()
+            return None
+
+
+def _skip_current(
+    specs: List[plotSpec], manifest: plotManifest, results: Dict[int, plotResult]
+) -> Dict[int, Tuple[str, List[Optional[int]]]]:
+    """Fills results of plots which are up to date, returns digests
+    and modification times of the outputs of the others"""
+    toRender = {}
+    for index, spec in enumerate(specs):
+        digest = spec.digest()
+        if manifest.needs_update(spec.allOutputs, digest):
+            toRender[index] = (digest, manifest.mtimes(spec.allOutputs))
+        else:
+            results[index] = plotResult(spec.name, 0, skipped=True)
+    return toRender
+
+
+def render(
+    specs: List[plotSpec],
+    nProcesses: int = 1,
+    atlasStyle: bool = True,
+    manifest: Optional[plotManifest] = None,
+) -> List[plotResult]:
+    """Renders all plots, failure of one plot does not stop the others,
+    even if it crashes the worker process (e.g. segfault in ROOT).
+
+    Arguments:
+        specs (``List[plotSpec]``): plots to render
+        nProcesses (``int``): number of worker processes,
+            1 renders in the current process
+        atlasStyle (``bool``): if True, ATLAS style is set in each worker
+        manifest (``plotManifest``): if provided, plots whose outputs
+            are up to date are skipped, the others are recorded
+            once rendered
+
+    Returns:
+        results in the order of specs (``List[plotResult]``)
+    """
+    global _specs
+    _specs = list(specs)
+    results: Dict[int, plotResult] = {}
+
+    if manifest is not None:
+        toRender = _skip_current(_specs, manifest, results)
+    else:
+        toRender = {index: ("", []) for index in range(len(_specs))}
+
+    if nProcesses <= 1:
+        _init_worker(atlasStyle)
+        for index in toRender:
+            results[index] = _render_one(index)
+    elif toRender:
+        _render_in_workers(list(toRender), min(nProcesses, len(toRender)), atlasStyle, results)
+
+    # workers cannot update the manifest of this process
+    if manifest is not None:
+        for index, (digest, oldMtimes) in toRender.items():
+            if results[index].ok:
+                manifest.update_written(_specs[index].allOutputs, digest, oldMtimes)
+
+    _specs = []
+    ordered = [results[index] for index in range(len(specs))]
+    _log_summary(ordered)
+    return ordered
+
+
+def _render_in_workers(
+    indices: List[int], nProcesses: int, atlasStyle: bool, results: Dict[int, plotResult]
+) -> None:
+    """Renders plots in worker processes, crashed workers are replaced"""
+    context = multiprocessing.get_context("fork")
+    pending = indices[::-1]
+    busy = []
+    for _ in range(nProcesses):
+        worker = _worker(context, atlasStyle)
+        worker.submit(pending.pop())
+        busy.append(worker)
+
+    while busy:
+        ready = multiprocessing.connection.wait([w.conn for w in busy])
+        for worker in [w for w in busy if w.conn in ready]:
+            index = worker.index
+            # only workers with a submitted plot are busy
+            assert index is not None
+            result = worker.receive()
+            if result is None:
+                exitCode = worker.process.exitcode
+                log.warning(f"Worker crashed with exit code {exitCode} on {_specs[index].name}")
+                result = plotResult(_specs[index].name, 0, f"Worker process crashed (exit code {exitCode})")
+                busy.remove(worker)
+                if pending:
+                    worker = _worker(context, atlasStyle)
+                    busy.append(worker)
+            results[index] = result
+
+            if worker in busy:
+                if pending:
+                    worker.submit(pending.pop())
+                else:
+                    worker.submit(None)
+                    worker.process.join()
+                    busy.remove(worker)
+
+
+def _log_summary(results: List[plotResult]) -> None:
+    failed = [r for r in results if not r.ok]
+    skipped = [r for r in results if r.skipped]
+    total = sum(r.seconds for r in results)
+    nRendered = len(results) - len(failed) - len(skipped)
+    log.info(f"Rendered {nRendered}/{len(results) - len(skipped)} plots in {total:.1f} s")
+    if skipped:
+        log.info(f"Skipped {len(skipped)} plots which are up to date")
+    for r in failed:
+        log.error(f"Plot {r.name} failed:\n{r.error}")
+    if len(skipped) < len(results):
+        slowest = max(results, key=lambda r: r.seconds)
+        log.info(f"Slowest plot {slowest.name}: {slowest.seconds:.2f} s")
@@ -0,0 +1,136 @@
+import ROOT
+from ROOT import TH1
+from typing import Any, Optional
+import hashlib
+import json
+import os
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Persistent cache of combined histograms.
+
+Histograms are stored in small ROOT files in a local directory,
+named by hash of everything the histogram depends on (see
+collection.cache_signature). Least recently used files are removed
+when the cache exceeds its size.
+"""
+
+
+class histoCache:
+    """On-disk cache of histograms with LRU eviction"""
+
+    def __init__(self, directory: str, maxSize: int = 1024**3) -> None:
+        """
+        Arguments:
+            directory (``str``): directory where the cache is stored,
+                created if it does not exist
+            maxSize (``int``): maximum size of the cache in bytes
+        """
+        self.directory = os.path.abspath(directory)
+        self.maxSize = maxSize
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(signature: Any) -> str:
+        """Returns key corresponding to the signature
+
+        Arguments:
+            signature (``Any``): json serializable description of the histogram
+        """
+        dump = json.dumps(signature, sort_keys=True, default=str)
+        return hashlib.sha256(dump.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".root")
+
+    def get(self, key: str) -> Optional[TH1]:
+        """Returns cached histogram or None if not in the cache
+
+        Arguments:
+            key (``str``): key of the histogram, see make_key
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        tFile = ROOT.TFile.Open(path)
+        if not tFile or tFile.IsZombie():
+            log.warning(f"Cached file {path} is broken, removing it")
+            self.invalidate(key)
+            self.misses += 1
+            return None
+        th = tFile.Get("h")
+        if th:
+            th.SetDirectory(ROOT.nullptr)
+        tFile.Close()
+        if not th:
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        # modification time is used to track last usage
+        os.utime(path)
+        self.hits += 1
+        log.debug(f"Histogram {key} loaded from cache")
+        return th
+
+    def put(self, key: str, th: TH1) -> None:
+        """Stores histogram in the cache
+
+        Arguments:
+            key (``str``): key of the histogram, see make_key
+            th (``TH1``): histogram to store (unchanged)
+        """
+        path = self._path(key)
+        # write to temporary file first, so that interrupted
+        # writing does not leave broken file in the cache
+        tmpPath = path + f".{os.getpid()}.tmp"
+        tFile = ROOT.TFile.Open(tmpPath, "RECREATE")
+        tFile.WriteObject(th, "h")
+        tFile.Close()
+        os.replace(tmpPath, path)
+        self._evict()
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Removes histogram from the cache,
+        or whole cache if key is not provided
+
+        Arguments:
+            key (``str``): key of the histogram, see make_key
+        """
+        if key is not None:
+            paths = [self._path(key)]
+        else:
+            paths = [os.path.join(self.directory, f) for f in self._files()]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def size(self) -> int:
+        """Returns size of the cache in bytes"""
+        return sum(
+            os.path.getsize(os.path.join(self.directory, f)) for f in self._files()
+        )
+
+    def _files(self):
+        return [f for f in os.listdir(self.directory) if f.endswith(".root")]
+
+    def _evict(self) -> None:
+        """Removes least recently used histograms until the cache fits maxSize"""
+        entries = []
+        for f in self._files():
+            stat = os.stat(os.path.join(self.directory, f))
+            entries.append((stat.st_mtime, stat.st_size, f))
+        total = sum(e[1] for e in entries)
+        for _, fileSize, f in sorted(entries):
+            if total <= self.maxSize:
+                break
+            log.debug(f"Removing {f} from cache")
+            os.remove(os.path.join(self.directory, f))
+            total -= fileSize
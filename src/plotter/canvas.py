@@ -1,7 +1,10 @@
 from .pad import pad
+from .output import outputWriter
+from .manifest import plotManifest
 import ROOT
 from ROOT import TCanvas
-from typing import Dict
+from typing import Dict, List, Optional
+import functools
 import os
 from .extern.shortuuid import uuid
 
@@ -9,6 +12,69 @@ import logging
 
 log = logging.getLogger(__name__)
 
+# extensions recognised by TCanvas.SaveAs, stripped from path when formats are given
+_FORMATS = ("png", "pdf", "eps", "ps", "svg", "C", "cxx", "root", "xml", "json", "gif", "jpg", "tiff", "tex")
+
+# writer of plots saved with background=True
+_backgroundWriter: Optional[outputWriter] = None
+
+
+def _save_paths(tcan: TCanvas, paths: List[str]) -> None:
+    oldIgnore = ROOT.gErrorIgnoreLevel
+    ROOT.gErrorIgnoreLevel = 3000
+    for path in paths:
+        tcan.SaveAs(path)
+    ROOT.gErrorIgnoreLevel = oldIgnore
+
+
+def _output_paths(path: str, formats: Optional[List[str]]) -> List[str]:
+    if formats is None:
+        return [path]
+    base, ext = os.path.splitext(path)
+    if ext[1:] not in _FORMATS:
+        base = path
+    return [f"{base}.{fmt.lstrip('.')}" for fmt in formats]
+
+
+def _save_now(tcan: TCanvas, paths: List[str]) -> None:
+    # if path contains directories, check if they exist
+    # if not, create them
+    dirName = os.path.dirname(paths[0]) if paths else ""
+    if dirName != "" and not os.path.exists(dirName):
+        log.info(f"Creating directory {dirName}")
+        os.makedirs(dirName, exist_ok=True)
+    _save_paths(tcan, paths)
+
+
+def _save_with_writer(
+    tcan: TCanvas,
+    paths: List[str],
+    writer: outputWriter,
+    manifest: Optional[plotManifest],
+    digest: str,
+) -> None:
+    # writer creates the directories on its own
+    tmpPaths = [writer.stage(p) for p in paths]
+    _save_paths(tcan, tmpPaths)
+    for tmpPath, p in zip(tmpPaths, paths):
+        # manifest is updated only once the file is in place
+        onDone = None if manifest is None else functools.partial(manifest.update, p, digest)
+        writer.submit(tmpPath, p, onDone)
+
+
+def _background_writer() -> outputWriter:
+    global _backgroundWriter
+    if _backgroundWriter is None:
+        _backgroundWriter = outputWriter()
+    return _backgroundWriter
+
+
+def wait_for_saves() -> None:
+    """Waits until all plots saved in background are written
+    (the writer is also flushed at exit)"""
+    if _backgroundWriter is not None:
+        _backgroundWriter.flush()
+
 
 class canvas:
     """Wrapper around TCanvas
@@ -45,30 +111,63 @@ class canvas:
         self.cd()
         p.tpad.Draw()
 
-    def save(self, path: str, verbose: bool = False):
+    def save(
+        self,
+        path: str,
+        verbose: bool = False,
+        formats: Optional[List[str]] = None,
+        background: bool = False,
+        writer: Optional[outputWriter] = None,
+        manifest: Optional[plotManifest] = None,
+        digest: Optional[str] = None,
+    ):
         """Calls SaveAs from TCanvas, creates dirs if necessary
 
         Arguments:
-            path (``str``): path to target file
+            path (``str``): path to target file, if formats are provided
+                path without extension (known extension is replaced)
+            verbose (``bool``): print paths of saved files
+            formats (``List[str]``): extensions, the canvas is updated once
+                and saved in all of them, e.g. ["png", "pdf", "eps", "C"]
+            background (``bool``): write files by the default outputWriter,
+                so that the next plot can be built in the meantime,
+                see wait_for_saves
+            writer (``outputWriter``): files are saved to local temporary
+                directory and moved to path (creating directories)
+                by the writer in background, implies background
+            manifest (``plotManifest``): if provided, saving is skipped
+                when all files exist with the same digest, otherwise
+                digest of each file is recorded once the file is written
+                (to skip also drawing see presets.build_and_save)
+            digest (``str``): digest of the inputs of the plot,
+                required with manifest, see presets.inputs_digest
         """
 
-        # if path contains directories, check if they exist
-        # if not, create them
-        if "/" in path:
-            dirName = path[: path.rindex("/")]
-            if not os.path.exists(dirName):
-                log.info(f"Creating directory {dirName}")
-                os.makedirs(dirName)
-
-        # TODO: maybe add automatic saving with multiple suffixes or something?
-        # printout not wanted, modify gErrorIgnoreLevel
-        # TODO: create decorator if used more often
-        oldIgnore = ROOT.gErrorIgnoreLevel
-        ROOT.gErrorIgnoreLevel = 3000
-        self.tcan.SaveAs(path)
+        paths = _output_paths(path, formats)
+
+        if manifest is not None and digest is None:
+            log.error("Digest of the plot inputs has to be provided with manifest!")
+            raise RuntimeError
+        if manifest is not None and not manifest.needs_update(paths, str(digest)):
+            return
+
+        if background and writer is None:
+            writer = _background_writer()
+
+        # paint once, SaveAs then only writes the painted canvas
+        self.tcan.Modified()
+        self.tcan.Update()
+
+        if writer is not None:
+            _save_with_writer(self.tcan, paths, writer, manifest, str(digest))
+        else:
+            oldMtimes = plotManifest.mtimes(paths)
+            _save_now(self.tcan, paths)
+            if manifest is not None:
+                manifest.update_written(paths, str(digest), oldMtimes)
         if verbose:
-            print(path)
-        ROOT.gErrorIgnoreLevel = oldIgnore
+            for p in paths:
+                print(p)
 
     def add_text(
         self,
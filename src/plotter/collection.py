@@ -1,9 +1,15 @@
-from typing import Optional, List, Dict, Union
-from ROOT import TH1
+from typing import Optional, List, Dict, Union, Any, TYPE_CHECKING
 from .dataset import dataset, sumOfWeightHelper
+from .nphisto import npHisto
+from . import parallel
 import copy
+import os
 import logging
 
+if TYPE_CHECKING:
+    from ROOT import TH1
+    from .cache import histoCache
+
 log = logging.getLogger(__name__)
 
 
@@ -35,6 +41,10 @@ class normalizationHelper:
         self.byXS = normByXS
         self.bySoW = normBySoW
 
+    def signature(self) -> List[bool]:
+        """Returns flags defining the normalization"""
+        return [self.toOne, self.byLumi, self.byXS, self.bySoW]
+
 
 def get_normalizationHelper(config):
 
@@ -94,7 +104,9 @@ class collection:
         histoName: str,
         norm: Optional[normalizationHelper] = None,
         skipBad: bool = False,
-    ) -> Optional[TH1]:
+        nThreads: int = 1,
+        cache: Optional["histoCache"] = None,
+    ) -> Optional["TH1"]:
         """Gets histograms from all datasets
         and correctly combines and normalizes them
 
@@ -104,6 +116,10 @@ class collection:
                 collection, see normalizationHelper class for details
             skipBad (``bool``): if histogram or file does not exist,
                 or is corrupted, it is skipped instead of raising error
+            nThreads (``int``): kept for compatibility, TH1 are read
+                serially (PyROOT calls hold the GIL), see get_np
+            cache (``histoCache``): if provided, combined histogram
+                is taken from/stored in the cache
 
         Returns:
             Combined histogram (``TH1``)
@@ -112,51 +128,304 @@ class collection:
         if len(self.datasets) == 0:
             raise RuntimeError(f"Collection {self.title} is empty!\n Add datasets!")
 
-        collTH: Optional[TH1] = None
-        for ds in self.datasets:
-            dsTH = ds.get(histoName, skipBad)
-            if dsTH is None:
-                if not skipBad:
-                    log.error("Got bad histogram from the dataset.")
-                    raise RuntimeError
-                continue
-
-            if norm is not None:
-                self.norm_ds(dsTH, ds, norm)
-
-            if collTH:
-                collTH.Add(dsTH)
-            else:
-                collTH = dsTH
+        if cache is not None:
+            key = cache.make_key(self.cache_signature(histoName, norm, skipBad))
+            collTH = cache.get(key)
+            if collTH is None:
+                collTH = self.get_th(histoName, norm, skipBad, nThreads)
+                if collTH is not None:
+                    cache.put(key, collTH)
+            return collTH
+
+        dsTHs = parallel.map_ordered(
+            lambda ds: self._get_ds_th(ds, histoName, norm, skipBad),
+            self.datasets,
+            nThreads,
+        )
+        collTH = _sum_ths(dsTHs)
 
         if collTH is None:
             return None
 
         if norm is not None and norm.toOne:
-            if collTH.Integral() == 0:
-                log.warning(
-                    f"Histogram {histoName} from collection {self.title} has integral 0."
-                )
-                log.warning("Cannot normalize to one!")
-            else:
-                collTH.Scale(1.0 / collTH.Integral())
+            _norm_to_one(collTH, histoName, self.title)
 
         return collTH
 
-    def norm_ds(self, th: TH1, ds: dataset, norm: normalizationHelper):
-        """Normalizes histogram from a dataset"""
+    def get_np(
+        self,
+        histoName: str,
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+        nThreads: int = 1,
+    ) -> Optional[npHisto]:
+        """Same as get_th, but histograms are converted to npHisto
+        right after reading, so normalization and combination
+        are done on numpy arrays without creating any TH1
+
+        Arguments:
+            histoName (``str``): name/path of histogram in given file
+            norm (``normalizationHelper``): defines normalization of the
+                collection, see normalizationHelper class for details
+            skipBad (``bool``): if histogram or file does not exist,
+                or is corrupted, it is skipped instead of raising error
+            nThreads (``int``): number of threads reading the datasets,
+                used only if all datasets use uproot backend,
+                datasets are combined in the same order as for
+                serial reading so the result is identical
+
+        Returns:
+            Combined histogram (``npHisto``)
+        """
+
+        if len(self.datasets) == 0:
+            raise RuntimeError(f"Collection {self.title} is empty!\n Add datasets!")
+
+        dsHs = parallel.map_ordered(
+            lambda ds: self._get_ds_np(ds, histoName, norm, skipBad),
+            self.datasets,
+            nThreads,
+            useROOT=not all(ds.uses_uproot() for ds in self.datasets),
+        )
+        collH = _sum_nps(dsHs)
+
+        if collH is not None and norm is not None and norm.toOne:
+            _norm_np_to_one(collH, histoName, self.title)
+
+        return collH
+
+    def get_ths(
+        self,
+        histoNames: List[str],
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+        nThreads: int = 1,
+    ) -> Dict[str, Optional["TH1"]]:
+        """Gets several histograms from all datasets
+        and correctly combines and normalizes them.
+        Each dataset is visited only once for all histograms.
+
+        Arguments:
+            histoNames (``List[str]``): names/paths of histograms in given file
+            norm (``normalizationHelper``): defines normalization of the
+                collection, see normalizationHelper class for details
+            skipBad (``bool``): if histogram or file does not exist,
+                or is corrupted, it is skipped instead of raising error
+            nThreads (``int``): kept for compatibility, TH1 are read
+                serially (PyROOT calls hold the GIL), see get_np
+
+        Returns:
+            Combined histograms by name (``Dict[str, TH1]``)
+        """
+
+        if len(self.datasets) == 0:
+            raise RuntimeError(f"Collection {self.title} is empty!\n Add datasets!")
+
+        histoNames = list(dict.fromkeys(histoNames))
+        dsTHs = parallel.map_ordered(
+            lambda ds: self._get_ds_ths(ds, histoNames, norm, skipBad),
+            self.datasets,
+            nThreads,
+        )
+
+        collTHs: Dict[str, Optional["TH1"]] = {}
+        for histoName in histoNames:
+            collTH = _sum_ths([ths[histoName] for ths in dsTHs if ths is not None])
+            if collTH is not None and norm is not None and norm.toOne:
+                _norm_to_one(collTH, histoName, self.title)
+            collTHs[histoName] = collTH
+
+        return collTHs
+
+    def _get_ds_th(
+        self,
+        ds: dataset,
+        histoName: str,
+        norm: Optional[normalizationHelper],
+        skipBad: bool,
+    ) -> Optional["TH1"]:
+        """Gets normalized histogram from a single dataset"""
+
+        dsTH = _to_th1(ds.get(histoName, skipBad))
+        if dsTH is None:
+            if not skipBad:
+                log.error("Got bad histogram from the dataset.")
+                raise RuntimeError
+            return None
+
+        if norm is not None:
+            self.norm_ds(dsTH, ds, norm)
+        return dsTH
+
+    def _get_ds_np(
+        self,
+        ds: dataset,
+        histoName: str,
+        norm: Optional[normalizationHelper],
+        skipBad: bool,
+    ) -> Optional[npHisto]:
+        """Gets normalized npHisto from a single dataset"""
+
+        dsH = ds.get_np(histoName, skipBad)
+        if dsH is None:
+            if not skipBad:
+                log.error("Got bad histogram from the dataset.")
+                raise RuntimeError
+            return None
+
+        if norm is not None:
+            self.norm_ds(dsH, ds, norm)
+        return dsH
+
+    def _get_ds_ths(
+        self,
+        ds: dataset,
+        histoNames: List[str],
+        norm: Optional[normalizationHelper],
+        skipBad: bool,
+    ) -> Optional[Dict[str, "TH1"]]:
+        """Gets normalized histograms from a single dataset"""
+
+        dsObjects = ds.get_many(histoNames, skipBad)
+        if dsObjects is None:
+            if not skipBad:
+                log.error("Got bad histograms from the dataset.")
+                raise RuntimeError
+            return None
+        dsTHs = {name: _to_th1(obj) for name, obj in dsObjects.items()}
+
+        if norm is not None:
+            factors = self.norm_factors(ds, norm)
+            for dsTH in dsTHs.values():
+                for factor in factors:
+                    dsTH.Scale(factor)
+        return dsTHs
 
+    def cache_signature(
+        self,
+        histoName: str,
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+    ) -> Dict[str, Any]:
+        """Returns description of everything the combined histogram depends on,
+        used as a key of histoCache"""
+
+        return {
+            "histoName": histoName,
+            "norm": norm.signature() if norm is not None else None,
+            "skipBad": skipBad,
+            "sow": [self.sow.histoName, self.sow.histoBin] if self.sow else None,
+            "datasets": [
+                [ds.path, _file_stat(ds.path), ds.XS, ds.lumi] for ds in self.datasets
+            ],
+        }
+
+    def norm_factors(self, ds: dataset, norm: normalizationHelper) -> List[float]:
+        """Returns factors by which histograms of a dataset are scaled,
+        in the order they are applied"""
+
+        factors = []
         if norm.byXS:
-            th.Scale(ds.XS)
+            factors.append(ds.XS)
         if norm.bySoW:
             if self.sow is None:
                 log.error(
                     "Trying to normalize by sum of weights,\n but none was provided!."
                 )
                 raise RuntimeError
-            th.Scale(1.0 / ds.get_sumOfWeights(self.sow))
+            factors.append(1.0 / ds.get_sumOfWeights(self.sow))
         if norm.byLumi:
-            th.Scale(ds.lumi)
+            factors.append(ds.lumi)
+        return factors
+
+    def norm_ds(self, th: Union["TH1", npHisto], ds: dataset, norm: normalizationHelper):
+        """Normalizes histogram (TH1 or npHisto) from a dataset"""
+
+        scale = th.scale if isinstance(th, npHisto) else th.Scale
+        for factor in self.norm_factors(ds, norm):
+            scale(factor)
+
+
+def _to_th1(obj: Any) -> Any:
+    """Histograms read by uproot backend are converted to TH1"""
+
+    if isinstance(obj, npHisto):
+        return obj.to_th1()
+    return obj
+
+
+def _sum_ths(ths: List[Optional["TH1"]]) -> Optional["TH1"]:
+    """Adds histograms in the given order into the first one,
+    missing (None) histograms are skipped"""
+
+    sumTH: Optional["TH1"] = None
+    for th in ths:
+        if th is None:
+            continue
+        if sumTH:
+            sumTH.Add(th)
+        else:
+            sumTH = th
+    return sumTH
+
+
+def _sum_nps(hs: List[Optional[npHisto]]) -> Optional[npHisto]:
+    """Adds npHistos in the given order into the first one,
+    missing (None) histograms are skipped"""
+
+    sumH: Optional[npHisto] = None
+    for h in hs:
+        if h is None:
+            continue
+        if sumH is None:
+            sumH = h
+        else:
+            sumH.add(h)
+    return sumH
+
+
+def _file_stat(path: str) -> Optional[List[int]]:
+    """Modification time and size of the file, None if it does not exist"""
+
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _norm_to_one(th: "TH1", histoName: str, title: str) -> None:
+    """Normalizes combined histogram to one if possible"""
+
+    if th.Integral() == 0:
+        log.warning(
+            f"Histogram {histoName} from collection {title} has integral 0."
+        )
+        log.warning("Cannot normalize to one!")
+    else:
+        th.Scale(1.0 / th.Integral())
+
+
+def _norm_np_to_one(h: npHisto, histoName: str, title: str) -> None:
+    """Normalizes combined npHisto to one if possible"""
+
+    if not h.norm_to_one():
+        log.warning(
+            f"Histogram {histoName} from collection {title} has integral 0."
+        )
+        log.warning("Cannot normalize to one!")
+
+
+def _norm_without_toOne(
+    norm: Optional[normalizationHelper],
+) -> Optional[normalizationHelper]:
+    """Copy of normalization for components of a SuperCollection,
+    which first need to be added and only then normalized to one"""
+
+    if norm is None or not norm.toOne:
+        return norm
+    normComponents = copy.copy(norm)
+    normComponents.toOne = False
+    return normComponents
 
 
 class SuperCollection:
@@ -180,7 +449,9 @@ class SuperCollection:
         histoName: str,
         norm: Optional[normalizationHelper] = None,
         skipBad: bool = False,
-    ) -> Optional[TH1]:
+        nThreads: int = 1,
+        cache: Optional["histoCache"] = None,
+    ) -> Optional["TH1"]:
         """Gets histograms from all datasets
         and correctly combines and normalizes them
 
@@ -190,6 +461,10 @@ class SuperCollection:
                 collection, see normalizationHelper class for details
             skipBad (``bool``): if histogram or file does not exist,
                 or is corrupted, it is skipped instead of raising error
+            nThreads (``int``): kept for compatibility,
+                see collection.get_th
+            cache (``histoCache``): if provided, combined histogram
+                is taken from/stored in the cache
 
         Returns:
             Combined histogram (``TH1``)
@@ -198,23 +473,21 @@ class SuperCollection:
         if len(self.container) == 0:
             raise RuntimeError(f"Collection {self.title} is empty!\n Add datasets!")
 
-        norm_orig = None
-        if norm:
-            norm_orig = copy.copy(norm)
-            if norm.toOne:
-                norm.toOne = (
-                    False  # need to first add contributions, and normalize at the end.
-                )
-
-        collTH: Optional[TH1] = None
-        for col in self.container:
+        if cache is not None:
+            key = cache.make_key(self.cache_signature(histoName, norm, skipBad))
+            collTH = cache.get(key)
+            if collTH is None:
+                collTH = self.get_th(histoName, norm, skipBad, nThreads)
+                if collTH is not None:
+                    cache.put(key, collTH)
+            return collTH
 
-            hist = col.get_th(histoName, norm, skipBad)
+        # need to first add contributions, and normalize at the end.
+        normComponents = _norm_without_toOne(norm)
 
-            if collTH:
-                collTH.Add(hist)
-            else:
-                collTH = hist
+        collTH = _sum_ths(
+            [col.get_th(histoName, normComponents, skipBad, nThreads) for col in self.container]
+        )
 
         if collTH is None:
             return None
@@ -222,17 +495,123 @@ class SuperCollection:
         # collection scalling
         collTH.Scale(self.scale_factor)
 
-        if norm_orig is not None and norm_orig.toOne:
-            if collTH.Integral() == 0:
-                log.warning(
-                    f"Histogram {histoName} from collection {self.title} has integral 0."
-                )
-                log.warning("Cannot normalize to one!")
-            else:
-                collTH.Scale(1.0 / collTH.Integral())
+        if norm is not None and norm.toOne:
+            _norm_to_one(collTH, histoName, self.title)
 
         return collTH
 
+    def get_np(
+        self,
+        histoName: str,
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+        nThreads: int = 1,
+    ) -> Optional[npHisto]:
+        """Same as get_th, but combined as npHisto without creating any TH1,
+        see collection.get_np
+
+        Arguments:
+            histoName (``str``): name/path of histogram in given file
+            norm (``normalizationHelper``): defines normalization of the
+                collection, see normalizationHelper class for details
+            skipBad (``bool``): if histogram or file does not exist,
+                or is corrupted, it is skipped instead of raising error
+            nThreads (``int``): number of threads reading the datasets
+                of each collection
+
+        Returns:
+            Combined histogram (``npHisto``)
+        """
+
+        if len(self.container) == 0:
+            raise RuntimeError(f"Collection {self.title} is empty!\n Add datasets!")
+
+        # need to first add contributions, and normalize at the end.
+        normComponents = _norm_without_toOne(norm)
+
+        collH = _sum_nps(
+            [col.get_np(histoName, normComponents, skipBad, nThreads) for col in self.container]
+        )
+
+        if collH is None:
+            return None
+
+        # collection scalling
+        if self.scale_factor is not None:
+            collH.scale(self.scale_factor)
+
+        if norm is not None and norm.toOne:
+            _norm_np_to_one(collH, histoName, self.title)
+
+        return collH
+
+    def cache_signature(
+        self,
+        histoName: str,
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+    ) -> Dict[str, Any]:
+        """Returns description of everything the combined histogram depends on,
+        used as a key of histoCache"""
+
+        return {
+            "histoName": histoName,
+            "norm": norm.signature() if norm is not None else None,
+            "scale_factor": self.scale_factor,
+            "components": [
+                col.cache_signature(histoName, _norm_without_toOne(norm), skipBad)
+                for col in self.container
+            ],
+        }
+
+    def get_ths(
+        self,
+        histoNames: List[str],
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+        nThreads: int = 1,
+    ) -> Dict[str, Optional["TH1"]]:
+        """Gets several histograms from all datasets
+        and correctly combines and normalizes them.
+        Each dataset is visited only once for all histograms.
+
+        Arguments:
+            histoNames (``List[str]``): names/paths of histograms in given file
+            norm (``normalizationHelper``): defines normalization of the
+                collection, see normalizationHelper class for details
+            skipBad (``bool``): if histogram or file does not exist,
+                or is corrupted, it is skipped instead of raising error
+            nThreads (``int``): kept for compatibility,
+                see collection.get_ths
+
+        Returns:
+            Combined histograms by name (``Dict[str, TH1]``)
+        """
+
+        if len(self.container) == 0:
+            raise RuntimeError(f"Collection {self.title} is empty!\n Add datasets!")
+
+        # need to first add contributions, and normalize at the end.
+        normComponents = _norm_without_toOne(norm)
+
+        histoNames = list(dict.fromkeys(histoNames))
+        colTHs = [
+            col.get_ths(histoNames, normComponents, skipBad, nThreads)
+            for col in self.container
+        ]
+
+        collTHs: Dict[str, Optional["TH1"]] = {}
+        for histoName in histoNames:
+            collTH = _sum_ths([ths[histoName] for ths in colTHs])
+            if collTH is not None:
+                # collection scalling
+                collTH.Scale(self.scale_factor)
+                if norm is not None and norm.toOne:
+                    _norm_to_one(collTH, histoName, self.title)
+            collTHs[histoName] = collTH
+
+        return collTHs
+
 
 class CollectionContainer:
     """Manages a set of collections"""
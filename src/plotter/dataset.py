@@ -1,18 +1,24 @@
-from ROOT import TH1, TTree
-from typing import Optional, Union
+from typing import Any, Optional, Union, List, Dict, Tuple, TYPE_CHECKING
+from collections import OrderedDict
+import json
 import os
+import threading
+import numpy as np
 
-# This way we can easily switch back to
-# TFile from ROOT if needed
-# Right now TFile2 does not provide
-# any advantage for dataset but
-# its derived class anyway
-from .tfile2 import TFile2 as TFile
+from .nphisto import npHisto
+from . import parallel
 
 import logging
 
+if TYPE_CHECKING:
+    from ROOT import TH1, TTree
+    from .tfile2 import TFile2
+
 log = logging.getLogger(__name__)
 
+# backends reading the files, see dataset.defaultBackend
+BACKENDS = ("root", "uproot")
+
 
 class sumOfWeightHelper:
     """Small helper class to get sum of weight
@@ -23,6 +29,47 @@ class sumOfWeightHelper:
     globally or something.
     """
 
+    def __init__(
+        self, histoName: str, histoBin: int, index: Optional["sowIndex"] = None
+    ) -> None:
+        """
+        Arguments:
+            histoName (``str``): name of histogram containing sum of weights
+            histoBin (``int``): bin in historgam containing sum of weights
+            index (``sowIndex``): precomputed sum of weights, used instead
+                of opening the file when available
+        """
+        self.histoName = histoName
+        self.histoBin = histoBin
+        self.index: Optional[sowIndex] = None
+        if index is not None:
+            self.set_index(index)
+
+    def set_index(self, index: "sowIndex") -> None:
+        """Use precomputed sum of weights
+
+        Arguments:
+            index (``sowIndex``): index built with the same histogram and bin
+        """
+        if index.histoName != self.histoName or index.histoBin != self.histoBin:
+            log.error(
+                f"Index built from {index.histoName} bin {index.histoBin} "
+                f"cannot be used for {self.histoName} bin {self.histoBin}!"
+            )
+            raise RuntimeError
+        self.index = index
+
+
+class sowIndex:
+    """Sum of weights of many files, so that they do not have
+    to be opened just to get the sum of weights.
+
+    Entries are keyed by file path and are valid only as long
+    as modification time and size of the file match.
+    Index is built once (e.g. per campaign) with build
+    and stored as JSON with save/load.
+    """
+
     def __init__(self, histoName: str, histoBin: int) -> None:
         """
         Arguments:
@@ -31,12 +78,248 @@ class sumOfWeightHelper:
         """
         self.histoName = histoName
         self.histoBin = histoBin
+        # path -> (mtime in ns, size, sum of weights)
+        self.entries: Dict[str, Tuple[int, int, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def build(
+        cls, datasets: List["dataset"], sow: sumOfWeightHelper, nThreads: int = 1
+    ) -> "sowIndex":
+        """Reads sum of weights of all datasets and creates the index,
+        always from the files (see dataset.read_sumOfWeights)
+
+        Arguments:
+            datasets (``List[dataset]``): datasets to index,
+                each file is read only once
+            sow (``sumOfWeightHelper``): defines histogram and bin
+                containing sum of weights
+            nThreads (``int``): number of threads reading the files,
+                used only if all datasets use uproot backend
+        """
+        index = cls(sow.histoName, sow.histoBin)
+
+        unique: Dict[str, dataset] = {}
+        for ds in datasets:
+            unique.setdefault(ds.path, ds)
+
+        def read(ds: dataset) -> Tuple[str, Optional[Tuple[int, int]], float]:
+            return ds.path, sowIndex._stat(ds.path), ds.read_sumOfWeights(sow)
+
+        useROOT = not all(ds.uses_uproot() for ds in unique.values())
+        for path, stat, sumOfWeights in parallel.map_ordered(
+            read, unique.values(), nThreads, useROOT
+        ):
+            if stat is not None:
+                index.entries[path] = (stat[0], stat[1], sumOfWeights)
+        log.info(f"Sum of weights index built for {len(index)} files")
+        return index
+
+    def lookup(self, path: str) -> Optional[float]:
+        """Returns sum of weights of the file or None if not indexed
+        or the file changed since the index was built
+
+        Arguments:
+            path (``str``): path to the file
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return None
+        if self._stat(path) != (entry[0], entry[1]):
+            log.debug(f"File {path} changed, ignoring sum of weights index")
+            return None
+        return entry[2]
+
+    def save(self, path: str) -> None:
+        """Saves the index as JSON
+
+        Arguments:
+            path (``str``): path of the output file
+        """
+        content = {
+            "histoName": self.histoName,
+            "histoBin": self.histoBin,
+            "files": {p: list(entry) for p, entry in self.entries.items()},
+        }
+        with open(path, "w") as f:
+            json.dump(content, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "sowIndex":
+        """Loads the index saved by save
+
+        Arguments:
+            path (``str``): path of the index file
+        """
+        log.debug(f"Loading sum of weights index {path}")
+        with open(path, "r") as f:
+            content = json.load(f)
+        index = cls(content["histoName"], content["histoBin"])
+        for p, (mtime, size, sumOfWeights) in content["files"].items():
+            index.entries[p] = (mtime, size, sumOfWeights)
+        return index
+
+
+class tfilePool:
+    """Keeps track of open TFiles of all datasets and limits their number.
+
+    When the limit is reached, the least recently used file is closed.
+    The dataset reopens it transparently when it is needed again.
+    Note that objects which stay attached to the file (e.g. TTree)
+    cannot be used after the file is closed, histograms are
+    always detached from the file.
+    """
+
+    def __init__(self, maxOpen: int = 0) -> None:
+        """
+        Arguments:
+            maxOpen (``int``): maximum number of open files, 0 for no limit
+        """
+        self.maxOpen = maxOpen
+        self._open: "OrderedDict[int, dataset]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # file was already open
+        self.hits = 0
+        # file opened for the first time
+        self.misses = 0
+        # file opened again after it was closed by the pool
+        self.reopens = 0
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns counters of the pool"""
+        return {
+            "open": len(self._open),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reopens": self.reopens,
+        }
+
+    def use(self, ds: "dataset") -> None:
+        """Marks already open file of the dataset as recently used"""
+        with self._lock:
+            self.hits += 1
+            if id(ds) in self._open:
+                self._open.move_to_end(id(ds))
+
+    def add(self, ds: "dataset", reopen: bool) -> None:
+        """Registers newly opened file of the dataset,
+        closes least recently used files if over the limit"""
+        with self._lock:
+            if reopen:
+                self.reopens += 1
+            else:
+                self.misses += 1
+            self._open[id(ds)] = ds
+            if self.maxOpen > 0:
+                self._evict(ds)
+
+    def remove(self, ds: "dataset") -> None:
+        """Removes dataset from the pool without closing its file"""
+        with self._lock:
+            self._open.pop(id(ds), None)
+
+    def _evict(self, keep: "dataset") -> None:
+        """Closes files until the limit is satisfied,
+        files currently read by other threads are skipped"""
+        for key in list(self._open.keys()):
+            if len(self._open) <= self.maxOpen:
+                break
+            ds = self._open[key]
+            if ds is keep or not ds._lock.acquire(blocking=False):
+                continue
+            try:
+                log.debug(f"Closing file {ds.path}, too many open files")
+                ds._close()
+                del self._open[key]
+            finally:
+                ds._lock.release()
+
+
+def _detach(obj: Union["TH1", "TTree"]) -> Union["TH1", "TTree"]:
+    """Detaches histograms from the file so that they survive its closing"""
+    import ROOT
+
+    if obj.InheritsFrom("TH1"):
+        obj.SetDirectory(ROOT.nullptr)
+    return obj
+
+
+def _from_uproot(obj: Any) -> Any:
+    """Converts histogram read by uproot to npHisto,
+    other objects (e.g. TTree) are returned as read by uproot"""
+    classname = getattr(obj, "classname", "")
+    if not classname.startswith(("TH1", "TH2", "TH3")):
+        return obj
+    nDim = int(classname[2])
+    edges = [obj.axis(i).edges() for i in range(nDim)]
+    # uproot arrays are indexed as [x][y][z], global bins of TH1 as [z][y][x],
+    # copies, as they can be views of arrays cached by uproot and npHisto is modified in place
+    sumw = np.array(obj.values(flow=True).T.ravel(), dtype=np.float64, copy=True)
+    sumw2 = None
+    if len(obj.member("fSumw2")) > 0:
+        sumw2 = np.array(obj.variances(flow=True).T.ravel(), dtype=np.float64, copy=True)
+    return npHisto(edges, sumw, sumw2, obj.member("fName"), obj.member("fTitle"), obj.member("fEntries"))
+
+
+def _read_keys(directory, names: Dict[str, str]) -> Dict[str, Union["TH1", "TTree"]]:
+    """Reads requested objects in a single pass over keys of the directory
+
+    Arguments:
+        directory (``TDirectory``): directory to read from
+        names (``Dict[str, str]``): key name to requested object name
+    """
+    objects: Dict[str, Union["TH1", "TTree"]] = {}
+    # keys of the same name are ordered from the highest cycle,
+    # so first match is the same object as returned by TFile::Get
+    for key in directory.GetListOfKeys():
+        objectName = names.get(key.GetName(), "")
+        if objectName == "" or objectName in objects:
+            continue
+        objects[objectName] = _detach(key.ReadObj())
+        if len(objects) == len(names):
+            break
+    return objects
 
 
 class dataset:
-    """Manages single ROOT TFile"""
+    """Manages single ROOT TFile
+
+    Open files of all datasets are tracked by dataset.filePool,
+    its maxOpen limits number of simultaneously open files.
+
+    The file is read either by PyROOT ("root" backend) or by uproot
+    ("uproot" backend), which does not need ROOT at all. Backend of all
+    datasets is set by dataset.defaultBackend, or per dataset by its backend.
+
+    Note that the backend changes what get and get_many return:
+    with uproot, histograms are npHisto (not TH1, so TH1 methods
+    like Integral or GetBinContent are not available) and other objects
+    (e.g. TTree) are uproot objects. Code working with both backends
+    should use get_np, which returns npHisto for either of them.
+    collection.get_th/get_ths convert npHisto to TH1, so they return
+    TH1 with both backends.
+    """
+
+    filePool = tfilePool()
+    defaultBackend = "root"
 
-    def __init__(self, title: str, path: str, XS: float = 1, lumi: float = 1) -> None:
+    def __init__(
+        self, title: str, path: str, XS: float = 1, lumi: float = 1, backend: Optional[str] = None
+    ) -> None:
         """
         Arguments:
             title (``str``): title of the sample,
@@ -46,18 +329,28 @@ class dataset:
                 (use 1 for data) /sumOfWeights and luminosity
                 are treated independently
             lumi (``float``): luminosity of the sample
+            backend (``str``): "root" or "uproot",
+                dataset.defaultBackend if not provided
         """
+        if backend is not None and backend not in BACKENDS:
+            log.error(f"Unknown backend {backend}, use one of {', '.join(BACKENDS)}")
+            raise RuntimeError
         self.name = title
         # create absolute path in case context changes
         self.path = os.path.abspath(path)
         self.XS = XS
         self.lumi = lumi
+        self.backend = backend
 
         # dataset can be created even if it not used
         # (e.g. some central list of samples)
         # so do not open TFile until it is used
-        self.tFile: TFile
+        self.tFile: "TFile2"
+        # file opened by uproot backend
+        self.uprootFile: Any = None
         self.open = False
+        # file can be closed by the filePool and reopened later
+        self.closedByPool = False
 
         # In some rare cases we want to simply
         # skip bad files and not throw error.
@@ -66,7 +359,11 @@ class dataset:
 
         # Sum of weights for normalization of MC,
         # when 0 not initiliazed
-        self.sumOfWeights = 0
+        self.sumOfWeights: float = 0
+
+        # dataset can be read from multiple threads
+        # (e.g. when same dataset is in multiple collections)
+        self._lock = threading.RLock()
 
     def open_tfile(self, skipBad: bool = False) -> bool:
         """Opens TFile corresponding to the path,
@@ -83,9 +380,8 @@ class dataset:
         # check if the file was already opened
         if not self.open:
             self.open = True
-            self.tFile = TFile(self.path)
             # check if the file is not broken
-            if self.tFile.IsZombie():
+            if not self._open_file():
                 log.error(f"Problem opening file {self.path}")
                 if not skipBad:
                     raise RuntimeError
@@ -93,14 +389,55 @@ class dataset:
             else:
                 log.debug(f"Success opening file {self.path}")
                 self.goodFile = True
+                dataset.filePool.add(self, self.closedByPool)
+                self.closedByPool = False
                 return True
         else:
             return self.goodFile
 
-    def get(
-        self, objectName: str, skipBad: bool = False
-    ) -> Optional[Union[TH1, TTree]]:
-        """Returns Object (usually TH1) corresponding to the path
+    def uses_uproot(self) -> bool:
+        """True if the file is read by uproot"""
+        backend = self.backend if self.backend is not None else dataset.defaultBackend
+        if backend not in BACKENDS:
+            log.error(f"Unknown backend {backend}, use one of {', '.join(BACKENDS)}")
+            raise RuntimeError
+        return backend == "uproot"
+
+    def _open_file(self) -> bool:
+        """Opens the file by the backend, returns False if it is broken"""
+        if self.uses_uproot():
+            import uproot
+
+            try:
+                self.uprootFile = uproot.open(self.path)
+            except (OSError, ValueError) as e:
+                log.debug(f"uproot cannot open {self.path}: {e}")
+                return False
+            return True
+
+        # This way we can easily switch back to
+        # TFile from ROOT if needed
+        # Right now TFile2 does not provide
+        # any advantage for dataset but
+        # its derived class anyway
+        from .tfile2 import TFile2 as TFile
+
+        self.tFile = TFile(self.path)
+        return not self.tFile.IsZombie()
+
+    def _close(self) -> None:
+        """Closes the file, it is reopened when needed (used by the filePool)"""
+        if self.open and self.goodFile:
+            if self.uprootFile is not None:
+                self.uprootFile.close()
+                self.uprootFile = None
+            else:
+                self.tFile.Close()
+            self.open = False
+            self.closedByPool = True
+
+    def _ensure_open(self, skipBad: bool) -> bool:
+        """Opens file if needed, returns True if it can be read
 
         Arguments:
             skipBad (``bool``): if True, does not
@@ -108,20 +445,108 @@ class dataset:
         """
 
         # check status of the file and raise error
-        # or return None in case of issues
+        # or return False in case of issues
         if not self.open:
             if not self.open_tfile(skipBad):
                 if not skipBad:
                     log.error(f"Problem opening file {self.path}")
                     raise RuntimeError
+                return False
+        elif self.goodFile:
+            dataset.filePool.use(self)
+        return self.goodFile
+
+    def get(
+        self, objectName: str, skipBad: bool = False
+    ) -> Optional[Union["TH1", "TTree", npHisto]]:
+        """Returns Object (usually TH1) corresponding to the path.
+        With uproot backend histograms are returned as npHisto
+        and other objects as uproot objects (not ROOT), see get_np.
+
+        Arguments:
+            skipBad (``bool``): if True, does not
+                raise error on bad file, False by default
+        """
+
+        with self._lock:
+            if not self._ensure_open(skipBad):
                 return None
-        if self.goodFile:
+            if self.uprootFile is not None:
+                return self._get_uproot(objectName)
             h = self.tFile.Get(objectName)
             if not h:  # is not None does not work for some reason
                 log.error(f"Object {objectName} does not exist in dataset {self.name}!")
                 raise RuntimeError
-            return h
-        return None
+            return _detach(h)
+
+    def _get_uproot(self, objectName: str) -> Any:
+        """Reads object by uproot, histograms are converted to npHisto"""
+        # uproot.KeyInFileError is KeyError
+        try:
+            obj = self.uprootFile[objectName]
+        except KeyError:
+            log.error(f"Object {objectName} does not exist in dataset {self.name}!")
+            raise RuntimeError
+        return _from_uproot(obj)
+
+    def get_np(self, histoName: str, skipBad: bool = False) -> Optional[npHisto]:
+        """Returns histogram corresponding to the path as npHisto,
+        the TH1 read from the file is not kept
+        (with uproot backend no TH1 is created)
+
+        Arguments:
+            histoName (``str``): name/path of the histogram
+            skipBad (``bool``): if True, does not
+                raise error on bad file, False by default
+        """
+        th = self.get(histoName, skipBad)
+        if th is None or isinstance(th, npHisto):
+            return th
+        return npHisto.from_th1(th)
+
+    def get_many(
+        self, objectNames: List[str], skipBad: bool = False
+    ) -> Optional[Dict[str, Union["TH1", "TTree", npHisto]]]:
+        """Returns Objects (usually TH1) corresponding to the paths.
+        Keys of each directory are scanned only once for all requested
+        objects, which is faster than calling get for each of them.
+        With uproot backend histograms are returned as npHisto
+        and other objects as uproot objects (not ROOT), see get_np.
+
+        Arguments:
+            objectNames (``List[str]``): names/paths of the objects
+            skipBad (``bool``): if True, does not
+                raise error on bad file, False by default
+
+        Returns:
+            Dictionary of objects by the requested name
+        """
+
+        with self._lock:
+            if not self._ensure_open(skipBad):
+                return None
+            if self.uprootFile is not None:
+                return {objectName: self._get_uproot(objectName) for objectName in objectNames}
+
+            # group requested objects by their directory
+            requested: Dict[str, Dict[str, str]] = {}
+            for objectName in objectNames:
+                dirName, _, keyName = objectName.rpartition("/")
+                requested.setdefault(dirName, {})[keyName] = objectName
+
+            objects: Dict[str, Union["TH1", "TTree"]] = {}
+            for dirName, names in requested.items():
+                directory = self.tFile.GetDirectory(dirName) if dirName else self.tFile
+                if not directory:
+                    log.error(f"Directory {dirName} does not exist in dataset {self.name}!")
+                    raise RuntimeError
+                objects.update(_read_keys(directory, names))
+
+            for objectName in objectNames:
+                if objectName not in objects:
+                    log.error(f"Object {objectName} does not exist in dataset {self.name}!")
+                    raise RuntimeError
+            return objects
 
     def get_sumOfWeights(self, sow: sumOfWeightHelper) -> float:
         """Defines sum of weight of given dataset and returns it.
@@ -137,21 +562,44 @@ class dataset:
         # and therefore sumOfWeights,
         # cannot change. Is this actually correct?
 
-        # if it was already derived simply return
-        if self.sumOfWeights != 0:
+        with self._lock:
+            # if it was already derived simply return
+            if self.sumOfWeights != 0:
+                return self.sumOfWeights
+
+            # if precomputed, there is no need to open the file
+            if sow.index is not None:
+                sumOfWeights = sow.index.lookup(self.path)
+                if sumOfWeights is not None:
+                    self.sumOfWeights = sumOfWeights
+                    return self.sumOfWeights
+
+            self.sumOfWeights = self.read_sumOfWeights(sow)
             return self.sumOfWeights
 
-        # get histogram with sum of weights
-        h = self.get(sow.histoName, False)
+    def read_sumOfWeights(self, sow: sumOfWeightHelper) -> float:
+        """Reads sum of weights from the file, ignoring the value
+        saved by get_sumOfWeights and the index of sow
 
-        if h is None:
-            log.error(f"Histogram {sow.histoName} does not exist!")
-            raise RuntimeError
-        else:
-            self.sumOfWeights = h.GetBinContent(sow.histoBin)
-        # TODO Here I can imagine negative sum of weights
-        # e.g. for some interferance sample but I have no idea
-        # how to handle such cases
-        assert self.sumOfWeights > 0, "Sum of weights should be positive!"
+        Arguments:
+            sow (``sumOfWeightsHelper``): defines name of histogram
+                and bin containing sumOfWeights
+        """
+
+        with self._lock:
+            # get histogram with sum of weights
+            h = self.get(sow.histoName, False)
+
+            if h is None:
+                log.error(f"Histogram {sow.histoName} does not exist!")
+                raise RuntimeError
+            elif isinstance(h, npHisto):
+                sumOfWeights = float(h.sumw[sow.histoBin])
+            else:
+                sumOfWeights = h.GetBinContent(sow.histoBin)
+            # TODO Here I can imagine negative sum of weights
+            # e.g. for some interferance sample but I have no idea
+            # how to handle such cases
+            assert sumOfWeights > 0, "Sum of weights should be positive!"
 
-        return self.sumOfWeights
+            return sumOfWeights
@@ -2,7 +2,8 @@ import ROOT
 from ROOT import TH1
 from . import thHelper
 from . import loader
-from typing import Optional, Dict, Any, List, Union
+from .nphisto import npHisto
+from typing import Optional, Any, Callable, Dict, List, Mapping, Tuple, Union
 from plotter.plottingbase import Plottable
 
 import logging
@@ -11,6 +12,13 @@ log = logging.getLogger(__name__)
 
 ROOT.TH1.AddDirectory(False)
 
+# option (matched as substring of the config key) -> setter of TH1
+_TH_SETTERS = (
+    ("markersize", "SetMarkerSize"),
+    ("fillstyle", "SetFillStyle"),
+    ("linestyle", "SetLineStyle"),
+)
+
 
 class histo(Plottable):
     """Wrapper class around TH1, setups the main properties
@@ -24,7 +32,7 @@ class histo(Plottable):
     def __init__(
         self,
         title: str,
-        th: TH1,
+        th: Union[TH1, npHisto],
         linecolor: int = ROOT.kBlack,
         fillcolor: Optional[int] = 0,
         drawoption: str = "",
@@ -32,11 +40,14 @@ class histo(Plottable):
     ) -> None:
         """
         Arguments:
-            th (``TH1``): ROOT histogram
+            th (``TH1/npHisto``): ROOT histogram, npHisto is converted
+                to TH1 (see npHisto.to_th1)
             linecolor (``int``): color of the histogram line
             fillcolor (``int/None``): color of the histogram fill,
                 can be None
         """
+        if isinstance(th, npHisto):
+            th = th.to_th1()
         self.th = th
         self.title = title
         super().__init__()
@@ -51,6 +62,53 @@ class histo(Plottable):
         self.isTH1 = th.InheritsFrom("TH1")
         self.isTGraph = th.InheritsFrom("TGraph")
 
+    @property
+    def th(self):
+        return self._th
+
+    @th.setter
+    def th(self, th) -> None:
+        self._th = th
+        self.reset_extrema()
+
+    def reset_extrema(self) -> None:
+        """Forgets cached extrema, has to be called
+        when the histogram is modified directly (e.g. th.Scale)"""
+        self._extrema: Dict[Tuple, Tuple[float, float, float]] = {}
+
+    def get_extrema(self, withErrors: bool = False) -> Tuple[float, float, float]:
+        """Returns minimum, minimum of positive values and maximum
+        of the histogram (see thHelper.get_extrema), respecting
+        the x-axis range and minimum/maximum set on TH1.
+
+        Computed in a single pass. For TH1 cached until the x-axis range
+        changes or the histogram is modified by histo methods,
+        after direct modification of TH1 (e.g. th.Scale) reset_extrema
+        has to be called. Extrema of TGraph are not cached.
+
+        Arguments:
+            withErrors (``bool``): if True, extrema of value -/+ error
+        """
+        if self.isTGraph:
+            # points can change without any cheap sign of it
+            return thHelper.get_extrema(self._th, withErrors)
+        axis = self._th.GetXaxis()
+        key = (withErrors, axis.GetFirst(), axis.GetLast())
+        extrema = self._extrema.get(key)
+        if extrema is None:
+            extrema = thHelper.get_extrema(self._th, withErrors)
+            self._extrema[key] = extrema
+        if not self.isTH1:
+            return extrema
+
+        # stored values take precedence, as in TH1::GetMinimum/GetMaximum
+        minimum, minPositive, maximum = extrema
+        if self._th.GetMinimumStored() != -1111:
+            minimum = minPositive = self._th.GetMinimumStored()
+        if self._th.GetMaximumStored() != -1111:
+            maximum = self._th.GetMaximumStored()
+        return minimum, minPositive, maximum
+
     def apply_all_style(self):
         self.th.SetTitle(self.title)
 
@@ -75,6 +133,7 @@ class histo(Plottable):
         Arguments:
             otherHist (``histo``): histogram to divide by
             option (``str``): if B then binomial errors"""
+        self.reset_extrema()
         return self.th.Divide(self.th, otherHisto.th, 1, 1, option)
 
     def divide_ratio(self, otherHisto: "histo"):
@@ -87,6 +146,7 @@ class histo(Plottable):
             otherHisto (``histo``): histo to be divided by
         """
         thHelper.divide_ratio(self.th, otherHisto.th)
+        self.reset_extrema()
 
     def get_ratio(
         self, otherHisto: "histo", suffix: str = "ratio", fillToLine: bool = False
@@ -105,6 +165,7 @@ class histo(Plottable):
             thHelper.divide_ratio(hratio.th, otherHisto.th)
         elif self.isTGraph:
             thHelper.divide_ratio_graph(hratio.th, otherHisto.th)
+        hratio.reset_extrema()
         # switch colors if requested
         fillcolor = None if fillToLine else self.fillcolor
         if fillcolor is None:
@@ -119,27 +180,17 @@ class histo(Plottable):
         hratio.linecolor = linecolor
         return hratio
 
-    def style_histo(self, style: Dict[str, Any]) -> None:
+    def style_histo(self, style: Mapping[str, Any]) -> None:
         """Applies style to the histo
 
         Arguments:
-            style (``Dict[str, Any]``): style config
+            style (``Mapping[str, Any]``): style config
         """
 
         log.debug("Updating histo style")
 
-        for opt, set in style.items():
-            if "markersize" in opt:
-                self.th.SetMarkerSize(set)
-            elif "fillstyle" in opt:
-                self.th.SetFillStyle(set)
-            elif "linestyle" in opt:
-                self.th.SetLineStyle(set)
-            elif "drawoption" in opt:
-                self.drawoption = set
-            else:
-                log.error(f"Unknown option {opt}")
-                raise RuntimeError
+        for setter in loader.compile_config(style, compile_histo_style):
+            setter(self)
 
     def rebin(self, binning: Union[int, List[float]] = []):
         """Rebins histogram either based on nbin or binning.
@@ -153,12 +204,22 @@ class histo(Plottable):
 
         if isinstance(binning, int):
             self.th.Rebin(binning)
+            self.reset_extrema()
             return
 
         self.th = thHelper.rebin(self.th, binning, False)
         self.apply_all_style()
 
     def clone(self, th_suffix: Optional[str] = None, histo_title: Optional[str] = None):
+        """Returns copy of the histo with cloned TH1.
+
+        Style state is copied directly (style containers are immutable),
+        TH1::Clone copies the ROOT attributes, so the clone is not decorated again.
+
+        Arguments:
+            th_suffix (``str``): suffix of the name of the cloned TH1
+            histo_title (``str``): title of the clone, same title by default
+        """
 
         if histo_title is None:
             histo_title = self.title
@@ -167,7 +228,45 @@ class histo(Plottable):
         if th_suffix is not None:
             hname = histo_title + "_" + th_suffix
 
-        h = histo(histo_title, self.th.Clone(hname))
-        h.decorate(self)
+        h = histo.__new__(histo)
+        h.__dict__.update(self.__dict__)
+        h.th = self.th.Clone(hname)
+        h.th.SetTitle(histo_title)
+        h.title = histo_title
+        # style config is not inherited by clones
+        h.config = {}
 
         return h
+
+
+def _set_drawoption(value: str) -> Callable[[histo], None]:
+    def setter(h: histo) -> None:
+        h.drawoption = value
+    return setter
+
+
+def _th_setter(method: str, value: Any) -> Callable[[histo], None]:
+    def setter(h: histo) -> None:
+        getattr(h.th, method)(value)
+    return setter
+
+
+def compile_histo_style(style: Mapping[str, Any]) -> List[Callable[[histo], None]]:
+    """Compiles histo style config into list of setters,
+    each applies one option to the given histo
+
+    Arguments:
+        style (``Mapping[str, Any]``): style config
+    """
+    setters = []
+    for opt, set in style.items():
+        method = next((m for key, m in _TH_SETTERS if key in opt), None)
+        if method is not None:
+            setters.append(_th_setter(method, set))
+        elif "drawoption" in opt:
+            setters.append(_set_drawoption(set))
+        else:
+            log.error(f"Unknown histo style option {opt}, known are: "
+                      f"{', '.join([key for key, _ in _TH_SETTERS] + ['drawoption'])}")
+            raise RuntimeError
+    return setters
@@ -0,0 +1,159 @@
+from .histo import histo
+from .collection import collection, SuperCollection, normalizationHelper
+from ROOT import TH1
+from typing import Any, Dict, List, Optional, Tuple, Union
+import copy
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Lazy histograms which are read only when needed.
+
+lazyHisto records where the histogram comes from and creates
+the histo only when its data are needed (e.g. pad.add_histo or draw).
+prefetch reads many lazyHistos at once, each dataset is visited
+only once and the same histogram is read only once.
+"""
+
+
+class lazyHisto:
+    """Placeholder for histo, which reads histogram from collection
+    on first access to any of the histo attributes.
+
+    Attributes set before the histogram is read are applied
+    to the histo once it is created.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        coll: Union[collection, SuperCollection],
+        histoName: str,
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+        **histoKwargs: Any,
+    ) -> None:
+        """
+        Arguments:
+            title (``str``): title of the histo
+            coll (``collection``): collection (or SuperCollection)
+                providing the histogram
+            histoName (``str``): name/path of the histogram in the files
+            norm (``normalizationHelper``): normalization of the collection
+            skipBad (``bool``): skip bad files, see collection.get_th
+            histoKwargs: other arguments of histo (e.g. linecolor, configPath)
+        """
+        # avoid __setattr__, which is forwarded to the histo
+        object.__setattr__(self, "_title", title)
+        object.__setattr__(self, "_coll", coll)
+        object.__setattr__(self, "_histoName", histoName)
+        object.__setattr__(self, "_norm", norm)
+        object.__setattr__(self, "_skipBad", skipBad)
+        object.__setattr__(self, "_histoKwargs", histoKwargs)
+        object.__setattr__(self, "_pending", {})
+        object.__setattr__(self, "_histo", None)
+
+    @property
+    def isLoaded(self) -> bool:
+        return self._histo is not None
+
+    def source_key(self) -> Tuple:
+        """Identifies histogram read by this lazyHisto,
+        lazyHistos with the same key read the same histogram"""
+        norm = tuple(self._norm.signature()) if self._norm is not None else None
+        return (id(self._coll), self._histoName, norm, self._skipBad)
+
+    def source_signature(self) -> Dict[str, Any]:
+        """Describes the histo without reading it (files, normalization,
+        title and style arguments), see presets.inputs_digest"""
+        return {
+            "title": self._title,
+            "source": self._coll.cache_signature(self._histoName, self._norm, self._skipBad),
+            "histoKwargs": self._histoKwargs,
+            "pending": self._pending,
+        }
+
+    def load(self, th: Optional[TH1] = None) -> histo:
+        """Creates the histo (reads the histogram if th is not provided)
+
+        Arguments:
+            th (``TH1``): already read histogram
+        """
+        if self._histo is not None:
+            return self._histo
+
+        if th is None:
+            log.debug(f"Reading {self._histoName} from {self._coll.title}")
+            th = self._coll.get_th(self._histoName, self._norm, self._skipBad)
+        if th is None:
+            log.error(f"Histogram {self._histoName} from {self._coll.title} not available!")
+            raise RuntimeError
+
+        h = histo(self._title, th, **self._histoKwargs)
+        for name, value in self._pending.items():
+            setattr(h, name, value)
+        object.__setattr__(self, "_histo", h)
+        return h
+
+    def __getattr__(self, name: str) -> Any:
+        # called only for attributes not found on lazyHisto itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name == "title" and self._histo is None:
+            return self._pending.get("title", self._title)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if self._histo is None:
+            self._pending[name] = value
+        else:
+            setattr(self._histo, name, value)
+
+    def __copy__(self) -> histo:
+        return copy.copy(self.load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.isLoaded else "not loaded"
+        return f"lazyHisto({self._title}, {self._histoName}, {state})"
+
+
+def prefetch(handles: List[lazyHisto], nThreads: int = 1) -> None:
+    """Reads all not yet loaded lazyHistos.
+
+    Histograms are read with collection.get_ths, so each collection
+    reads each of its datasets only once, and the same histogram
+    requested by several lazyHistos is read only once.
+
+    Arguments:
+        handles (``List[lazyHisto]``): lazyHistos to read
+        nThreads (``int``): kept for compatibility, see collection.get_ths
+    """
+
+    # group by collection and normalization
+    groups: Dict[Tuple, List[lazyHisto]] = {}
+    for handle in handles:
+        if handle.isLoaded:
+            continue
+        key = handle.source_key()
+        groups.setdefault((key[0],) + key[2:], []).append(handle)
+
+    for group in groups.values():
+        first = group[0]
+        histoNames = [h._histoName for h in group]
+        log.debug(f"Prefetching {len(set(histoNames))} histograms from {first._coll.title}")
+        ths = first._coll.get_ths(histoNames, first._norm, first._skipBad, nThreads)
+
+        # each histo needs its own TH1, as style is set on it,
+        # so clone before any of them is styled
+        used = set()
+        handleTHs = []
+        for handle in group:
+            th = ths[handle._histoName]
+            if th is not None and handle._histoName in used:
+                th = th.Clone()
+            used.add(handle._histoName)
+            handleTHs.append(th)
+
+        for handle, th in zip(group, handleTHs):
+            handle.load(th)
@@ -1,3 +1,5 @@
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Optional, Tuple
 import json
 import os
 import sys
@@ -7,19 +9,91 @@ log = logging.getLogger(__name__)
 
 """ Class for handling of configs
 
-Currently only loading.
+Currently only loading. Parsed configs are cached (by absolute path
+and modification time) and returned as read-only views, dicts as
+MappingProxyType and lists as tuples, as they are shared by all callers.
 
 TODO: Saving? Overwrite?
 """
 
+# absolute path -> (modification time, frozen config)
+_configs: Dict[str, Tuple[int, Any]] = {}
+# (id of frozen config, compiler) -> (config, compiled config)
+_compiled: Dict[Tuple[int, Callable], Tuple[Any, Any]] = {}
+
 
 def path():
     pkgPath = os.path.dirname(sys.modules["plotter"].__file__)
     return pkgPath + "/"
 
 
+def _freeze(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(value) for value in obj)
+    return obj
+
+
+def unfreeze(obj: Any) -> Any:
+    """Returns modifiable copy of the config (dicts and lists)
+
+    Arguments:
+        obj (``Any``): config returned by load_config
+    """
+    if isinstance(obj, MappingProxyType):
+        return {key: unfreeze(value) for key, value in obj.items()}
+    if isinstance(obj, tuple):
+        return [unfreeze(value) for value in obj]
+    return obj
+
+
 def load_config(path: str):
+    """Returns read-only config, the file is parsed only if it was
+    not loaded yet or it changed since, see reload_config
+
+    Arguments:
+        path (``str``): path to the json config
+    """
+    absPath = os.path.abspath(path)
+    mtime = os.stat(absPath).st_mtime_ns
+    cached = _configs.get(absPath)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
     log.debug(f"Loading config file {path}")
-    with open(path, "r") as f:
-        config = json.load(f)
-        return config
+    with open(absPath, "r") as f:
+        config = _freeze(json.load(f))
+    _configs[absPath] = (mtime, config)
+    return config
+
+
+def reload_config(path: Optional[str] = None) -> None:
+    """Forgets cached config, so it is parsed again on the next load_config
+
+    Arguments:
+        path (``str``): path to the config, all configs if not provided
+    """
+    if path is None:
+        _configs.clear()
+    else:
+        _configs.pop(os.path.abspath(path), None)
+
+
+def compile_config(config: Any, compiler: Callable[[Any], Any]) -> Any:
+    """Returns compiler(config), for frozen configs (from load_config)
+    the result is cached, so each config is compiled only once
+
+    Arguments:
+        config (``Any``): config to compile
+        compiler (``Callable``): e.g. histo.compile_histo_style
+    """
+    if not isinstance(config, MappingProxyType):
+        return compiler(config)
+    key = (id(config), compiler)
+    cached = _compiled.get(key)
+    if cached is None:
+        # config is stored as well, so its id is not reused
+        cached = (config, compiler(config))
+        _compiled[key] = cached
+    return cached[1]
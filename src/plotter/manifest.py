@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional
+import json
+import os
+import threading
+import weakref
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Manifest of saved plots for incremental rebuilds.
+
+For every saved file the manifest remembers digest of the inputs
+of the plot (histogram contents, styles and configs, preset parameters,
+see presets.inputs_digest). The digest is computed before anything is
+drawn, so when all outputs of a plot exist with the same digest,
+the plot is not built at all. Files are recorded only once they are
+written, including files written in background by outputWriter.
+"""
+
+
+def _write(path: str, entries: Dict[str, str], lock: threading.Lock) -> None:
+    """Writes entries to the manifest file, atomically"""
+    dirName = os.path.dirname(path)
+    if dirName != "":
+        os.makedirs(dirName, exist_ok=True)
+    tmpPath = f"{path}.{os.getpid()}.tmp"
+    with lock:
+        entriesCopy = dict(entries)
+    with open(tmpPath, "w") as f:
+        json.dump({"plots": entriesCopy}, f, indent=1, sort_keys=True)
+    os.replace(tmpPath, path)
+
+
+class plotManifest:
+    """Digests of saved plots, stored as json.
+    The file is written by save, and also when the manifest
+    is garbage collected or at exit."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Arguments:
+            path (``str``): path to the manifest file,
+                created on save if it does not exist
+        """
+        self.path = path
+        self.entries: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.entries = json.load(f).get("plots", {})
+
+        self.skipped = 0
+        self.written = 0
+        # updated also from the outputWriter thread
+        self._lock = threading.Lock()
+        # does not reference self, so the manifest can be collected
+        self._finalizer = weakref.finalize(self, _write, path, self.entries, self._lock)
+
+    def needs_update(self, outputs: List[str], digest: str) -> bool:
+        """Returns False (and counts the plot as skipped)
+        if all outputs are current, see is_current
+
+        Arguments:
+            outputs (``List[str]``): paths of the files of the plot
+            digest (``str``): digest of the plot inputs
+        """
+        if all(self.is_current(output, digest) for output in outputs):
+            with self._lock:
+                self.skipped += 1
+            return False
+        return True
+
+    def is_current(self, output: str, digest: str) -> bool:
+        """Returns True if output exists and was saved with the same digest
+
+        Arguments:
+            output (``str``): path of the saved file
+            digest (``str``): digest of the plot
+        """
+        with self._lock:
+            recorded = self.entries.get(output)
+        return recorded == digest and os.path.exists(output)
+
+    def update(self, output: str, digest: str) -> None:
+        """Records digest of the saved file
+
+        Arguments:
+            output (``str``): path of the saved file
+            digest (``str``): digest of the plot
+        """
+        with self._lock:
+            self.entries[output] = digest
+            self.written += 1
+
+    @staticmethod
+    def mtimes(outputs: List[str]) -> List[Optional[int]]:
+        """Returns modification times of the files (None if missing),
+        to be passed to update_written
+
+        Arguments:
+            outputs (``List[str]``): paths of the files
+        """
+        return [os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in outputs]
+
+    def update_written(self, outputs: List[str], digest: str, oldMtimes: List[Optional[int]]) -> None:
+        """Records digest of the files which were (re)written since
+        oldMtimes were taken, as ROOT does not report failed writes
+
+        Arguments:
+            outputs (``List[str]``): paths of the files
+            digest (``str``): digest of the plot
+            oldMtimes (``List[Optional[int]]``): see mtimes
+        """
+        for output, oldMtime, mtime in zip(outputs, oldMtimes, self.mtimes(outputs)):
+            if mtime is not None and mtime != oldMtime:
+                self.update(output, digest)
+
+    def save(self) -> None:
+        """Writes the manifest and reports skipped plots"""
+        _write(self.path, self.entries, self._lock)
+        if self.skipped or self.written:
+            log.info(f"Plots unchanged and skipped: {self.skipped}, files saved: {self.written}")
@@ -0,0 +1,388 @@
+from typing import Any, List, Optional, Sequence, Tuple
+import numpy as np
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Compact numpy histogram independent of ROOT.
+
+npHisto holds only bin edges and arrays of sum of weights
+and sum of squared weights (under/overflow included, indexed
+by global bin as in TH1). Adding, scaling, ratio, rebinning and
+integrals work on the arrays, so normalization and combination
+of histograms (see collection.get_np) do not allocate TH1s.
+Conversion from/to TH1 (from_th1/to_th1) is done only at the
+boundaries, when reading from the dataset and when drawing.
+
+The array kernels (divide_arrays, match_edges, rebin_array)
+are shared with thHelper.
+"""
+
+
+def divide_arrays(
+    num: np.ndarray, numErr: np.ndarray, den: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Divides contents and errors by the denominator
+    ignoring errors of the denominator.
+    Where the denominator is zero, content and error are set to 0.
+
+    Arguments:
+        num (``np.ndarray``): numerator contents
+        numErr (``np.ndarray``): numerator errors
+        den (``np.ndarray``): denominator contents
+
+    Returns:
+        contents (``np.ndarray``), errors (``np.ndarray``)
+    """
+    nonZero = den != 0
+    safeDen = np.where(nonZero, den, 1)
+    val = np.where(nonZero, num / safeDen, 0.0)
+    err = np.where(nonZero, numErr / safeDen, 0.0)
+    return val, err
+
+
+def match_edges(oldEdges: np.ndarray, newEdges: np.ndarray) -> np.ndarray:
+    """Finds indices of old edges corresponding to the new edges.
+    Edges match if they are closer than 1/1000 of the old bin width.
+
+    Arguments:
+        oldEdges (``np.ndarray``): sorted edges of the original binning
+        newEdges (``np.ndarray``): edges of the new binning
+
+    Returns:
+        indices of the matched old edges (``np.ndarray``)
+    """
+    oldEdges = np.asarray(oldEdges, dtype=np.float64)
+    newEdges = np.asarray(newEdges, dtype=np.float64)
+    nOld = len(oldEdges) - 1
+    widths = np.diff(oldEdges)
+    epsilon = np.append(widths, widths[-1]) / 1000
+
+    # the closest old edge is either just below or just above
+    above = np.clip(np.searchsorted(oldEdges, newEdges), 0, nOld)
+    below = np.clip(above - 1, 0, nOld)
+    closer = np.where(
+        np.abs(oldEdges[above] - newEdges) < np.abs(oldEdges[below] - newEdges),
+        above,
+        below,
+    )
+    found = np.abs(oldEdges[closer] - newEdges) < epsilon[closer]
+    if not np.all(found) or np.any(np.diff(closer) <= 0):
+        raise RuntimeError(
+            'Provided binning does not match '
+            'bins of the current histogram and rebinning is not possible! '
+            'New bins have to be combinations of bins the original '
+            'histogram.'
+        )
+    return closer
+
+
+def rebin_array(values: np.ndarray, matched: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Sums bins of the array (including under/overflow) into new bins
+    defined by matched edges (see match_edges).
+    Bins outside of the new range go to the new under/overflow.
+
+    Arguments:
+        values (``np.ndarray``): bin values, under/overflow included
+        matched (``np.ndarray``): indices of old edges of the new binning
+        axis (``int``): axis of the array to rebin
+    """
+    starts = np.concatenate(([0], np.asarray(matched) + 1))
+    return np.add.reduceat(values, starts, axis=axis)
+
+
+class npHisto:
+    """Histogram as numpy arrays: edges of each axis,
+    sum of weights and sum of squared weights
+    (both including under/overflow, indexed by global bin)"""
+
+    __slots__ = ("name", "title", "edges", "sumw", "sumw2", "entries")
+
+    def __init__(
+        self,
+        edges: Sequence[np.ndarray],
+        sumw: Optional[np.ndarray] = None,
+        sumw2: Optional[np.ndarray] = None,
+        name: str = "",
+        title: str = "",
+        entries: Optional[float] = None,
+    ) -> None:
+        """
+        Arguments:
+            edges (``Sequence[np.ndarray]``): bin edges of x (y, z) axis
+            sumw (``np.ndarray``): sum of weights by global bin
+                (under/overflow included), zeros by default
+            sumw2 (``np.ndarray``): sum of squared weights,
+                |sumw| by default (as TH1 without Sumw2)
+            name (``str``): name of the histogram, used for TH1
+            title (``str``): title of the histogram
+            entries (``float``): number of entries, sum of weights by default
+        """
+        if not 1 <= len(edges) <= 3:
+            log.error(f"Histogram has to have 1 to 3 axes, got {len(edges)}!")
+            raise RuntimeError
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        nCells = int(np.prod([len(e) + 1 for e in self.edges]))
+        if sumw is None:
+            sumw = np.zeros(nCells)
+        self.sumw = np.asarray(sumw, dtype=np.float64)
+        self.sumw2 = np.abs(self.sumw) if sumw2 is None else np.asarray(sumw2, dtype=np.float64)
+        if len(self.sumw) != nCells or len(self.sumw2) != nCells:
+            log.error(f"Arrays of histogram {name} do not match its binning!")
+            raise RuntimeError
+        self.name = name
+        self.title = title
+        self.entries = float(np.sum(self.sumw)) if entries is None else entries
+
+    @property
+    def dimension(self) -> int:
+        return len(self.edges)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Shape of the arrays as [z][y][x] (under/overflow included),
+        the same order as global bins of TH1"""
+        return tuple(len(e) + 1 for e in reversed(self.edges))
+
+    @property
+    def values(self) -> np.ndarray:
+        """Sum of weights without under/overflow, as [z][y][x]"""
+        return self.sumw.reshape(self.shape)[(slice(1, -1),) * self.dimension]
+
+    @property
+    def errors(self) -> np.ndarray:
+        """Bin errors by global bin (under/overflow included)"""
+        return np.sqrt(self.sumw2)
+
+    @property
+    def underflow(self) -> float:
+        """Underflow of 1D histogram"""
+        return float(self.sumw[0])
+
+    @property
+    def overflow(self) -> float:
+        """Overflow of 1D histogram"""
+        return float(self.sumw[-1])
+
+    def copy(self, name: Optional[str] = None) -> "npHisto":
+        """Returns copy with own arrays
+
+        Arguments:
+            name (``str``): name of the copy, the same name by default
+        """
+        return npHisto(
+            self.edges, self.sumw.copy(), self.sumw2.copy(),
+            self.name if name is None else name, self.title, self.entries,
+        )
+
+    def same_binning(self, other: "npHisto") -> bool:
+        """True if both histograms have the same edges"""
+        return len(self.edges) == len(other.edges) and all(
+            np.array_equal(mine, theirs) for mine, theirs in zip(self.edges, other.edges)
+        )
+
+    def _check_binning(self, other: "npHisto") -> None:
+        if not self.same_binning(other):
+            log.error(f"Histograms {self.name} and {other.name} have different binning!")
+            raise ValueError
+
+    def add(self, other: "npHisto", factor: float = 1) -> None:
+        """Adds other histogram (multiplied by factor), same as TH1::Add
+
+        Arguments:
+            other (``npHisto``): histogram to add
+            factor (``float``): multiplication factor
+        """
+        self._check_binning(other)
+        self.sumw += factor * other.sumw
+        self.sumw2 += factor * factor * other.sumw2
+        self.entries += other.entries
+
+    def __iadd__(self, other: "npHisto") -> "npHisto":
+        self.add(other)
+        return self
+
+    def __add__(self, other: "npHisto") -> "npHisto":
+        result = self.copy()
+        result.add(other)
+        return result
+
+    def __radd__(self, other: Any) -> "npHisto":
+        # so that sum() of histograms works
+        if isinstance(other, (int, float)) and other == 0:
+            return self.copy()
+        return NotImplemented
+
+    def scale(self, factor: float) -> None:
+        """Multiplies contents by factor (errors accordingly), same as TH1::Scale
+
+        Arguments:
+            factor (``float``): multiplication factor
+        """
+        self.sumw *= factor
+        self.sumw2 *= factor * factor
+
+    def __mul__(self, factor: float) -> "npHisto":
+        result = self.copy()
+        result.scale(factor)
+        return result
+
+    __rmul__ = __mul__
+
+    def integral(self, includeFlow: bool = False) -> float:
+        """Sum of weights, by default without under/overflow
+        as TH1::Integral()
+
+        Arguments:
+            includeFlow (``bool``): include under/overflow bins
+        """
+        if includeFlow:
+            return float(np.sum(self.sumw))
+        return float(np.sum(self.values))
+
+    def norm_to_one(self) -> bool:
+        """Scales the histogram so that its integral is one,
+        returns False if the integral is 0"""
+        integral = self.integral()
+        if integral == 0:
+            return False
+        self.scale(1.0 / integral)
+        return True
+
+    def ratio(self, denominator: "npHisto", name: Optional[str] = None) -> "npHisto":
+        """Returns histogram divided by denominator, errors of the denominator
+        are not taken into account (see thHelper.divide_ratio).
+        Only the visible bins are divided, under/overflow are kept.
+        Bins with empty denominator are set to 0.
+
+        Arguments:
+            denominator (``npHisto``): histogram to divide by
+            name (``str``): name of the ratio, name + "_ratio" by default
+        """
+        self._check_binning(denominator)
+        ratio = self.copy(self.name + "_ratio" if name is None else name)
+        visible = (slice(1, -1),) * self.dimension
+        sumw = ratio.sumw.reshape(self.shape)
+        sumw2 = ratio.sumw2.reshape(self.shape)
+        contents, errors = divide_arrays(
+            sumw[visible], np.sqrt(sumw2[visible]), denominator.sumw.reshape(self.shape)[visible]
+        )
+        sumw[visible] = contents
+        sumw2[visible] = errors * errors
+        return ratio
+
+    def rebin(
+        self,
+        binning: Optional[Sequence[float]] = None,
+        norm_by_width: bool = False,
+        ybinning: Optional[Sequence[float]] = None,
+        zbinning: Optional[Sequence[float]] = None,
+    ) -> "npHisto":
+        """Returns rebinned copy, new bins have to be combinations
+        of the original bins (see thHelper.rebin).
+        Axes without new binning are kept.
+
+        Arguments:
+            binning (``Sequence[float]``): bin edges of the x-axis
+            norm_by_width (``bool``): divide contents by bin width
+                (area for 2D, volume for 3D)
+            ybinning (``Sequence[float]``): bin edges of the y-axis
+            zbinning (``Sequence[float]``): bin edges of the z-axis
+        """
+        sumw = self.sumw.reshape(self.shape)
+        sumw2 = self.sumw2.reshape(self.shape)
+        newEdges = []
+        for iAxis, (oldEdges, newBinning) in enumerate(zip(self.edges, [binning, ybinning, zbinning])):
+            if newBinning is None:
+                newEdges.append(oldEdges)
+                continue
+            edges = np.asarray(newBinning, dtype=np.float64)
+            matched = match_edges(oldEdges, edges)
+            newEdges.append(edges)
+            sumw = rebin_array(sumw, matched, axis=-1 - iAxis)
+            sumw2 = rebin_array(sumw2, matched, axis=-1 - iAxis)
+
+        result = npHisto(newEdges, sumw.ravel(), sumw2.ravel(), "Rebin" + self.name, self.title, self.entries)
+        if norm_by_width:
+            result.scale_by_width()
+        return result
+
+    def scale_by_width(self) -> None:
+        """Divides contents by bin width (area, volume), same as
+        TH1::Scale(1, "width"), under/overflow are kept"""
+        width = np.ones(1)
+        for edges in self.edges:
+            # flow bins are divided by 1
+            axisWidth = np.concatenate(([1.0], np.diff(edges), [1.0]))
+            width = np.multiply.outer(axisWidth, width)
+        width = width.ravel()
+        self.sumw /= width
+        self.sumw2 /= width * width
+
+    @classmethod
+    def from_th1(cls, th: Any) -> "npHisto":
+        """Creates histogram from TH1 (arrays are copied)
+
+        Arguments:
+            th (``TH1``): ROOT histogram, profiles are not supported
+        """
+        from . import thHelper
+
+        if not th.InheritsFrom("TH1") or th.InheritsFrom("TProfile"):
+            log.error(f"Cannot convert {th.ClassName()} {th.GetName()} to npHisto!")
+            raise RuntimeError
+        axes = [th.GetXaxis(), th.GetYaxis(), th.GetZaxis()][: th.GetDimension()]
+        return cls(
+            [thHelper.get_edges(axis) for axis in axes],
+            thHelper.get_contents(th).astype(np.float64),
+            thHelper.get_sumw2(th).copy(),
+            th.GetName(),
+            th.GetTitle(),
+            th.GetEntries(),
+        )
+
+    def to_th1(self, name: Optional[str] = None) -> Any:
+        """Creates TH1D/TH2D/TH3D with the same binning and contents
+
+        Arguments:
+            name (``str``): name of the new histogram, the same name by default
+        """
+        import ROOT
+        from . import thHelper
+
+        binning: List[Any] = []
+        for edges in self.edges:
+            binning += [len(edges) - 1, np.ascontiguousarray(edges)]
+        constructor = [ROOT.TH1D, ROOT.TH2D, ROOT.TH3D][self.dimension - 1]
+        # Supress warning for replacing histogram
+        ignoreLevel = ROOT.gErrorIgnoreLevel
+        ROOT.gErrorIgnoreLevel = ROOT.kError
+        th = constructor(self.name if name is None else name, self.title, *binning)
+        ROOT.gErrorIgnoreLevel = ignoreLevel
+        th.SetDirectory(ROOT.nullptr)
+        thHelper.set_contents(th, self.sumw, sumw2=self.sumw2)
+        th.SetEntries(self.entries)
+        return th
+
+    def __repr__(self) -> str:
+        bins = "x".join(str(len(e) - 1) for e in self.edges)
+        return f"npHisto({self.name!r}, {bins} bins, integral {self.integral():g})"
+
+
+def stack_cumulative(hs: List[npHisto]) -> None:
+    """Turns histograms into stack, each histogram becomes sum of itself
+    and all following histograms (see thHelper.stack_cumulative)
+
+    Arguments:
+        hs (``List[npHisto]``): histograms (modified), top of the stack first
+    """
+    if len(hs) < 2:
+        return
+    for h in hs[1:]:
+        hs[0]._check_binning(h)
+    sumw = np.cumsum(np.stack([h.sumw for h in hs])[::-1], axis=0)[::-1]
+    sumw2 = np.cumsum(np.stack([h.sumw2 for h in hs])[::-1], axis=0)[::-1]
+    entries = np.cumsum([h.entries for h in hs][::-1])[::-1]
+    for i, h in enumerate(hs):
+        h.sumw, h.sumw2, h.entries = sumw[i], sumw2[i], float(entries[i])
@@ -0,0 +1,114 @@
+from typing import Callable, List, Optional, Set, Tuple
+import atexit
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Asynchronous writing of plots.
+
+Plots are saved by ROOT to a temporary directory on local disk,
+which is fast. Creation of output directories and moving of the files
+to their final (possibly network) location is done by a background thread,
+so that the plotting loop does not wait for the filesystem.
+"""
+
+
+class outputWriter:
+    """Moves files saved in local temporary directory to their
+    final location in a background thread"""
+
+    def __init__(self, tmpDir: Optional[str] = None, maxBacklog: int = 32) -> None:
+        """
+        Arguments:
+            tmpDir (``str``): local directory for temporary files,
+                system temporary directory by default
+            maxBacklog (``int``): maximum number of files waiting to be moved,
+                stage waits when the backlog is full
+        """
+        self.tmpDir = tempfile.mkdtemp(prefix="plotter_", dir=tmpDir)
+        self._queue: queue.Queue = queue.Queue(maxBacklog)
+        self._createdDirs: Set[str] = set()
+        self._errors: List[str] = []
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+        self._closed = False
+        atexit.register(self.close)
+
+    def stage(self, path: str) -> str:
+        """Returns temporary path where the file should be written,
+        submit moves it to path afterwards
+
+        Arguments:
+            path (``str``): final path of the file
+        """
+        # keep the name, ROOT chooses format by extension
+        # and name of the function in .C macro by file name
+        itemDir = tempfile.mkdtemp(dir=self.tmpDir)
+        return os.path.join(itemDir, os.path.basename(path))
+
+    def submit(self, tmpPath: str, path: str, onDone: Optional[Callable[[], None]] = None) -> None:
+        """Schedules move of the written file to its final location
+
+        Arguments:
+            tmpPath (``str``): temporary path returned by stage
+            path (``str``): final path of the file
+            onDone (``Callable``): called by the writer thread
+                once the file is in place (not called if the move fails)
+        """
+        if self._closed:
+            log.error("outputWriter is already closed!")
+            raise RuntimeError
+        self._queue.put((tmpPath, path, onDone))
+
+    def _work(self) -> None:
+        while True:
+            item: Optional[Tuple[str, str, Optional[Callable[[], None]]]] = self._queue.get()
+            try:
+                if item is None:
+                    return
+                tmpPath, path, onDone = item
+                self._move(tmpPath, path)
+                if onDone is not None:
+                    onDone()
+            except Exception as e:
+                self._errors.append(f"{item[1] if item else ''}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _move(self, tmpPath: str, path: str) -> None:
+        dirName = os.path.dirname(path)
+        if dirName != "" and dirName not in self._createdDirs:
+            if not os.path.exists(dirName):
+                log.info(f"Creating directory {dirName}")
+                os.makedirs(dirName, exist_ok=True)
+            self._createdDirs.add(dirName)
+        shutil.move(tmpPath, path)
+        os.rmdir(os.path.dirname(tmpPath))
+
+    def flush(self) -> None:
+        """Waits until all submitted files are moved,
+        raises error if any of them failed"""
+        self._queue.join()
+        if self._errors:
+            errors, self._errors = self._errors, []
+            log.error("Failed to write:\n" + "\n".join(errors))
+            raise RuntimeError
+
+    def close(self) -> None:
+        """Flushes the writer, stops the thread and removes temporary directory"""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+            shutil.rmtree(self.tmpDir, ignore_errors=True)
+            atexit.unregister(self.close)
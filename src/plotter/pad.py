@@ -1,9 +1,8 @@
 from . import loader
 from .histo import histo
-from . import thHelper
 import ROOT
 from ROOT import TPad
-from typing import List, Dict, Optional, Any
+from typing import Any, Callable, List, Mapping, Optional, Sequence
 
 import logging
 
@@ -38,7 +37,7 @@ class pad:
         self.tpad = TPad(name, name, xl, yl, xh, yh)
         self.name = name
 
-        self.config: Dict[str, Any] = {}
+        self.config: Mapping[str, Any] = {}
         if configPath != "":
             self.config = loader.load_config(configPath)
 
@@ -169,17 +168,15 @@ class pad:
         if self.customYrange:
             return
 
+        yMin, yMinZero, yMax = h.get_extrema()
         if self.histos == []:
-            self.yMin = h.th.GetMinimum()
-            self.yMinZero = h.th.GetMinimum(0)
-            self.yMax = h.th.GetMaximum()
+            self.yMin = yMin
+            self.yMinZero = yMinZero
+            self.yMax = yMax
         else:
-            if self.yMin > h.th.GetMinimum():
-                self.yMin = h.th.GetMinimum()
-            if self.yMinZero > h.th.GetMinimum(0):
-                self.yMinZero = h.th.GetMinimum(0)
-            if self.yMax < h.th.GetMaximum():
-                self.yMax = h.th.GetMaximum()
+            self.yMin = min(self.yMin, yMin)
+            self.yMinZero = min(self.yMinZero, yMinZero)
+            self.yMax = max(self.yMax, yMax)
 
     def _update_range_tgraph(self, h: histo) -> None:
         """Updates yMin/yMax if applicable for TH1"""
@@ -188,16 +185,13 @@ class pad:
         if self.customYrange:
             return
 
+        yMin, _, yMax = h.get_extrema()
         if self.histos == []:
-            self.yMin = thHelper.get_graph_minimum(h.th)
-            self.yMax = thHelper.get_graph_maximum(h.th)
+            self.yMin = yMin
+            self.yMax = yMax
         else:
-            cur_min = thHelper.get_graph_minimum(h.th)
-            if self.yMin > cur_min:
-                self.yMin = cur_min
-            cur_max = thHelper.get_graph_maximum(h.th)
-            if self.yMax < cur_max:
-                self.yMax = cur_max
+            self.yMin = min(self.yMin, yMin)
+            self.yMax = max(self.yMax, yMax)
 
     def plot_histos(self) -> None:
         """Plots histograms, including creation of basis,
@@ -232,6 +226,7 @@ class pad:
                 drawoption="hist",
             )
         self.basis.th.Reset()
+        self.basis.reset_extrema()
         self._set_basis_axis_title()
 
         if self.customYrange:
@@ -352,33 +347,23 @@ class pad:
         if self.basis is not None:
             self._set_basis_xrange()
 
-    def style_pad_margin(self, style: Dict[str, Any]) -> None:
+    def style_pad_margin(self, style: Mapping[str, Any]) -> None:
         """Applies style to the pad margins
 
         Arguments:
-            style (``Dict[str, Any]``): style config
+            style (``Mapping[str, Any]``): style config
         """
 
         log.debug("Updating margin style")
 
-        for opt, set in style.items():
-            if "margin_up" in opt:
-                self.tpad.SetTopMargin(set)
-            elif "margin_down" in opt:
-                self.tpad.SetBottomMargin(set)
-            elif "margin_left" in opt:
-                self.tpad.SetLeftMargin(set)
-            elif "margin_right" in opt:
-                self.tpad.SetRightMargin(set)
-            else:
-                log.error(f"Unknown option {opt}")
-                raise RuntimeError
+        for setter in loader.compile_config(style, compile_margin_style):
+            setter(self.tpad)
 
-    def style_pad_basis(self, style: Dict[str, Any]) -> None:
+    def style_pad_basis(self, style: Mapping[str, Any]) -> None:
         """Applies style to the pad basis
 
         Arguments:
-            style (``Dict[str, Any]``): style config
+            style (``Mapping[str, Any]``): style config
         """
 
         if self.basis is None:
@@ -386,8 +371,8 @@ class pad:
             raise RuntimeError
         log.debug("Updating basis style")
 
-        for opt, set in style.items():
-            self.update_style(opt, set)
+        for setter in loader.compile_config(style, compile_basis_style):
+            setter(self.basis)
 
     def update_style(self, opt: str, set: Any) -> None:
         """Update an option.
@@ -400,26 +385,38 @@ class pad:
             log.error("Called pad style but no basis yet!")
             raise RuntimeError
 
-        if "x_" in opt:
-            axis = self.basis.th.GetXaxis()
-            update_style_axis(axis, opt, set)
-        elif "y_" in opt:
-            axis = self.basis.th.GetYaxis()
-            update_style_axis(axis, opt, set)
-        elif "n_div" in opt:
-            if len(set) != 2:
-                log.error("n_div option in wrong format, need two items")
-                raise RuntimeError
-            if self.basis.isTH1:
-                self.basis.th.SetNdivisions(set[0], set[1])
-        else:
-            log.error(f"Unknown option {opt}")
-            raise RuntimeError
+        for setter in compile_basis_style({opt: set}):
+            setter(self.basis)
 
 
 # STYLE HELPERS
 
 
+# option (matched as substring of the config key) -> setter
+_MARGIN_SETTERS = (
+    ("margin_up", "SetTopMargin"),
+    ("margin_down", "SetBottomMargin"),
+    ("margin_left", "SetLeftMargin"),
+    ("margin_right", "SetRightMargin"),
+)
+_AXIS_SETTERS = (
+    ("titleOffset", "SetTitleOffset"),
+    ("titleSize", "SetTitleSize"),
+    ("titleFont", "SetTitleFont"),
+    ("labelSize", "SetLabelSize"),
+    ("labelFont", "SetLabelFont"),
+)
+
+
+def _find_setter(opt: str, setters: tuple, kind: str) -> str:
+    method = next((m for key, m in setters if key in opt), None)
+    if method is None:
+        log.error(f"Unknown {kind} style option {opt}, known are: "
+                  f"{', '.join(key for key, _ in setters)}")
+        raise RuntimeError
+    return method
+
+
 def update_style_axis(axis, opt, set):
     """Update style of an axis
 
@@ -428,16 +425,60 @@ def update_style_axis(axis, opt, set):
         opt (``str``): option name
         set (``Any``): option value
     """
-    if "titleOffset" in opt:
-        axis.SetTitleOffset(set)
-    elif "titleSize" in opt:
-        axis.SetTitleSize(set)
-    elif "titleFont" in opt:
-        axis.SetTitleFont(set)
-    elif "labelSize" in opt:
-        axis.SetLabelSize(set)
-    elif "labelFont" in opt:
-        axis.SetLabelFont(set)
-    else:
-        log.error(f"Unknown option {opt}")
-        raise RuntimeError
+    getattr(axis, _find_setter(opt, _AXIS_SETTERS, "axis"))(set)
+
+
+def _margin_setter(method: str, value: float) -> Callable[[TPad], None]:
+    def setter(tpad: TPad) -> None:
+        getattr(tpad, method)(value)
+    return setter
+
+
+def _axis_setter(getAxis: str, method: str, value: Any) -> Callable[[histo], None]:
+    def setter(basis: histo) -> None:
+        getattr(getattr(basis.th, getAxis)(), method)(value)
+    return setter
+
+
+def _ndiv_setter(value: Sequence[Any]) -> Callable[[histo], None]:
+    nDiv, axes = value
+
+    def setter(basis: histo) -> None:
+        if basis.isTH1:
+            basis.th.SetNdivisions(nDiv, axes)
+    return setter
+
+
+def compile_margin_style(style: Mapping[str, Any]) -> List[Callable[[TPad], None]]:
+    """Compiles margin config into list of setters applied to TPad
+
+    Arguments:
+        style (``Mapping[str, Any]``): style config
+    """
+    return [
+        _margin_setter(_find_setter(opt, _MARGIN_SETTERS, "margin"), set)
+        for opt, set in style.items()
+    ]
+
+
+def compile_basis_style(style: Mapping[str, Any]) -> List[Callable[[histo], None]]:
+    """Compiles basis config into list of setters applied to basis histo
+
+    Arguments:
+        style (``Mapping[str, Any]``): style config
+    """
+    setters = []
+    for opt, set in style.items():
+        if "x_" in opt:
+            setters.append(_axis_setter("GetXaxis", _find_setter(opt, _AXIS_SETTERS, "axis"), set))
+        elif "y_" in opt:
+            setters.append(_axis_setter("GetYaxis", _find_setter(opt, _AXIS_SETTERS, "axis"), set))
+        elif "n_div" in opt:
+            if len(set) != 2:
+                log.error("n_div option in wrong format, need two items")
+                raise RuntimeError
+            setters.append(_ndiv_setter(set))
+        else:
+            log.error(f"Unknown basis style option {opt}, known are: x_*, y_*, n_div")
+            raise RuntimeError
+    return setters
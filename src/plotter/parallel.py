@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, TypeVar
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Helpers for concurrent processing, mainly I/O of many files.
+
+Only work which does not call ROOT is done in threads (e.g. reading
+by uproot). PyROOT keeps the GIL during C++ calls, so threads reading
+by ROOT are serialized anyway and only add the cost of ROOT thread safety.
+"""
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def map_ordered(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    nThreads: int = 1,
+    useROOT: bool = True,
+) -> List[R]:
+    """Applies func to all items using nThreads threads.
+
+    Results are returned in the order of the items, so any following
+    reduction is the same as for the serial processing.
+    The first exception raised by func is re-raised.
+
+    Arguments:
+        func (``Callable``): function applied to each item
+        items (``Iterable``): items to process
+        nThreads (``int``): number of threads, 1 for serial processing
+        useROOT (``bool``): if True, func calls ROOT and items
+            are processed serially regardless of nThreads
+    """
+    items = list(items)
+    if nThreads <= 1 or len(items) <= 1 or useROOT:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(nThreads, len(items))) as executor:
+        return list(executor.map(func, items))
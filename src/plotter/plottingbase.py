@@ -5,6 +5,7 @@ Adapted from https://github.com/rootpy/rootpy
 
 import sys
 import ROOT
+from typing import Any, Dict, Tuple
 
 
 __all__ = [
@@ -480,15 +481,48 @@ class _StyleContainer(object):
     """
     Base class for grouping together an input style with ROOT and matplotlib
     styles.
+
+    Containers are interned: creating a container for a value seen before
+    returns the existing one, so the conversion (which may allocate a new
+    TColor) is done only once per value. The matplotlib style is converted
+    only when requested.
     """
 
+    # (container class, type of input, input) -> container
+    _interned: Dict[Tuple[Any, ...], "_StyleContainer"] = {}
+    _INTERNED_TYPES = (int, float, str, tuple, type(None))
+
+    def __new__(cls, value, *args):
+        if not isinstance(value, _StyleContainer._INTERNED_TYPES):
+            return super(_StyleContainer, cls).__new__(cls)
+        key = (cls, type(value), value)
+        try:
+            return _StyleContainer._interned[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable tuple
+            return super(_StyleContainer, cls).__new__(cls)
+        container = super(_StyleContainer, cls).__new__(cls)
+        _StyleContainer._interned[key] = container
+        return container
+
     def __init__(self, value, function):
+        if "_root" in self.__dict__:
+            # interned container already initialized
+            return
         self._input = value
+        self._function = function
         self._root = function(value, "root")
-        try:
-            self._mpl = function(value, "mpl")
-        except ValueError:
-            self._mpl = self._root
+
+    @property
+    def _mpl(self):
+        if "_mplStyle" not in self.__dict__:
+            try:
+                self._mplStyle = self._function(self._input, "mpl")
+            except ValueError:
+                self._mplStyle = self._root
+        return self._mplStyle
 
     def __call__(self, output_type=None):
         if not output_type:
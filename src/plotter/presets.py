@@ -1,13 +1,21 @@
 from .canvas import canvas
 from .pad import pad
 from .histo import histo
+from .lazy import lazyHisto
+from .manifest import plotManifest
 from . import loader
+from . import thHelper
 from .legend import legend
+from .systematics import syst_ratio_lines
 
 import ROOT
 from ROOT import TGraphAsymmErrors
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence
 import copy
+import glob
+import hashlib
+import json
+import os
 
 import logging
 import ctypes
@@ -15,6 +23,117 @@ import ctypes
 log = logging.getLogger(__name__)
 
 
+def _digest_th(th, sha) -> None:
+    sha.update(th.ClassName().encode())
+    if th.InheritsFrom("TGraph"):
+        arrays = thHelper.get_graph_arrays(th)
+    else:
+        axes = [th.GetXaxis(), th.GetYaxis(), th.GetZaxis()][: th.GetDimension()]
+        sha.update(repr([(a.GetFirst(), a.GetLast(), a.GetTitle()) for a in axes]).encode())
+        arrays = [thHelper.get_edges(a) for a in axes]
+        arrays += [thHelper.get_contents(th), thHelper.get_sumw2(th)]
+    for array in arrays:
+        sha.update(array.astype("float64").tobytes())
+
+
+def _digest_input(obj: Any, sha) -> None:
+    if isinstance(obj, lazyHisto) and not obj.isLoaded:
+        # not read yet, described by its source
+        signature = obj.source_signature()
+        configPath = signature["histoKwargs"].get("configPath", "")
+        if configPath != "":
+            signature["config"] = loader.unfreeze(loader.load_config(configPath))
+        sha.update(json.dumps(signature, sort_keys=True, default=repr).encode())
+    elif isinstance(obj, (histo, lazyHisto)):
+        description = [obj.title, obj.decorators, loader.unfreeze(obj.config)]
+        sha.update(json.dumps(description, sort_keys=True, default=repr).encode())
+        _digest_th(obj.th, sha)
+    elif isinstance(obj, (ROOT.TH1, ROOT.TGraph)):
+        _digest_th(obj, sha)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _digest_input(item, sha)
+    elif isinstance(obj, dict):
+        for key in sorted(obj):
+            sha.update(repr(key).encode())
+            _digest_input(obj[key], sha)
+    else:
+        sha.update(repr(obj).encode())
+
+
+def inputs_digest(
+    preset: str,
+    presetKwargs: Dict[str, Any],
+    args: Sequence[Any],
+    extra: Sequence[Any] = (),
+) -> str:
+    """Returns digest of everything a preset plot is built from,
+    to be used with plotManifest before the plot is built.
+
+    Histos enter by title, style, config, binning, contents and errors,
+    lazyHistos which are not read yet by their files and normalization
+    (see collection.cache_signature). Configs of the package
+    (e.g. pad configs) are included as well.
+
+    Arguments:
+        preset (``str``): name of the preset class, e.g. "dataMC"
+        presetKwargs (``Dict``): arguments of the preset constructor
+        args (``Sequence``): arguments of add_and_plot of the preset
+        extra (``Sequence``): anything else the plot depends on
+            (e.g. labels added after add_and_plot)
+    """
+    sha = hashlib.sha256()
+    sha.update(preset.encode())
+    for obj in (presetKwargs, list(args), list(extra)):
+        _digest_input(obj, sha)
+    for configPath in sorted(glob.glob(os.path.join(loader.path(), "configs", "*.json"))):
+        sha.update(json.dumps(loader.unfreeze(loader.load_config(configPath)), sort_keys=True).encode())
+    return sha.hexdigest()
+
+
+def build_and_save(
+    preset: str,
+    args: Sequence[Any],
+    outputs: List[str],
+    manifest: plotManifest,
+    presetKwargs: Optional[Dict[str, Any]] = None,
+    decorate: Optional[Callable[[Any], None]] = None,
+    **saveKwargs: Any,
+) -> Optional[Any]:
+    """Builds and saves the plot only if its inputs changed
+    since the outputs were saved (or some output is missing),
+    nothing is drawn otherwise.
+
+    Arguments:
+        preset (``str``): name of the preset class, e.g. "dataMC"
+        args (``Sequence``): arguments of add_and_plot of the preset
+        outputs (``List[str]``): paths where the plot is saved
+        manifest (``plotManifest``): manifest of saved plots
+        presetKwargs (``Dict``): arguments of the preset constructor
+        decorate (``Callable``): called with the preset after
+            add_and_plot, e.g. to add labels, its name enters the digest
+        saveKwargs: other arguments of save (e.g. background)
+
+    Returns:
+        the preset, None if the plot was skipped
+    """
+    presetKwargs = presetKwargs if presetKwargs is not None else {}
+    extra: List[Any] = [outputs]
+    if decorate is not None:
+        extra.append(f"{decorate.__module__}.{decorate.__qualname__}")
+    digest = inputs_digest(preset, presetKwargs, args, extra)
+    if not manifest.needs_update(outputs, digest):
+        return None
+
+    plot = globals()[preset](**presetKwargs)
+    plot.add_and_plot(*args)
+    if decorate is not None:
+        decorate(plot)
+    for output in outputs:
+        plot.save(output, manifest=manifest, digest=digest, **saveKwargs)
+    return plot
+
+
 class simple:
     def __init__(
         self,
@@ -59,8 +178,8 @@ class simple:
     def set_yrange(self, min, max):
         self.mainPad.set_yrange(min, max)
 
-    def save(self, plotName: str, verbose=False):
-        self.canvas.save(plotName, verbose)
+    def save(self, plotName: str, verbose=False, **kwargs):
+        self.canvas.save(plotName, verbose, **kwargs)
 
 
 class dataMC:
@@ -112,9 +231,10 @@ class dataMC:
         for _hMC in _hMCs:
             hMC = _hMC.clone("stack")
             hMC.linewidth = 0  # do not show stat of individual stack components
-            for hOther in self.hMCs:
-                hOther.th.Add(hMC.th)
             self.hMCs.append(hMC)
+        thHelper.stack_cumulative([hMC.th for hMC in self.hMCs])
+        for hMC in self.hMCs:
+            hMC.reset_extrema()
 
         # MC stat uncertainty
         if len(self.hMCs):
@@ -180,32 +300,8 @@ class dataMC:
         self.ratioPad.update_range()
 
     def _xrange_emptysupressed(self):
-        """Determine x range containing nonzero"""  # TODO REVIEW
-        xMin = self.hData.th.GetBinLowEdge(1)
-        xMax = self.hData.th.GetBinLowEdge(self.hData.th.GetNbinsX() + 1)
-        prevCont = False
-        minDone = False
-        maxDone = False
-        for i in range(self.hData.th.GetNbinsX()):
-            iBin = i + 1
-            if (
-                self.hData.th.GetBinContent(iBin) != 0
-                or self.hMCs[0].th.GetBinContent(iBin) != 0
-            ):
-                minDone = True
-                prevCont = True
-                continue
-
-            if not minDone:
-                xMin = self.hData.th.GetBinLowEdge(iBin + 1)
-            if prevCont:
-                xMax = self.hData.th.GetBinLowEdge(iBin)
-                maxDone = True
-            prevCont = False
-        if not maxDone:
-            xMax = self.hData.th.GetBinLowEdge(self.hData.th.GetNbinsX() + 1)
-
-        return (xMin, xMax)
+        """Determine x range containing nonzero"""
+        return thHelper.nonempty_xrange([self.hData.th, self.hMCs[0].th])
 
     def set_xrange(self, min, max):
         self.custom_xrange = True
@@ -216,7 +312,7 @@ class dataMC:
         self.mainPad.logx(doLog)
         self.ratioPad.logx(doLog)
 
-    def save(self, plotName: str, verbose=False):
+    def save(self, plotName: str, verbose=False, **kwargs):
         self.canvas.tcan.cd()
         self.leg = legend()
         self.leg.add_histo(self.hData)
@@ -225,9 +321,7 @@ class dataMC:
         if self.hShapes != []:
             self.leg.add_histos(self.hShapes)
         self.leg.create_and_draw()
-        if verbose:
-            print(plotName)
-        self.canvas.save(plotName)
+        self.canvas.save(plotName, verbose, **kwargs)
 
 
 class fraction:
@@ -263,10 +357,12 @@ class fraction:
                 first = False
             else:
                 self.hAll.th.Add(h.th)
+                self.hAll.reset_extrema()
 
         for h in hToFrac:
             hF = h.clone("stack")
             hF.th.Divide(self.hAll.th)
+            hF.reset_extrema()
             self.hFrac.append(hF)
 
         self.mainPad.add_histos(self.hFrac)
@@ -283,8 +379,8 @@ class fraction:
     def logx(self, doLog=True):
         self.mainPad.logx(doLog)
 
-    def save(self, plotName: str, verbose=False):
-        self.canvas.save(plotName, verbose)
+    def save(self, plotName: str, verbose=False, **kwargs):
+        self.canvas.save(plotName, verbose, **kwargs)
 
 
 class Comparison:
@@ -326,28 +422,7 @@ class Comparison:
 
         # get xmin, xmin, empty bins are cut away
         if self.nonEmpty:
-            xMin = histos[0].th.GetBinLowEdge(1)
-            xMax = histos[0].th.GetBinLowEdge(histos[0].th.GetNbinsX() + 1)
-            prevCont = False
-            minDone = False
-            maxDone = False
-            for i in range(histos[0].th.GetNbinsX()):
-                iBin = i + 1
-                if (
-                    histos[0].th.GetBinContent(iBin) == 0
-                    and self.histos[0].th.GetBinContent(iBin) == 0
-                ):
-                    if not minDone:
-                        xMin = histos[0].th.GetBinLowEdge(iBin + 1)
-                    if prevCont:
-                        xMax = histos[0].th.GetBinLowEdge(iBin)
-                        maxDone = True
-                    prevCont = False
-                else:
-                    minDone = True
-                    prevCont = True
-            if not maxDone:
-                xMax = histos[0].th.GetBinLowEdge(self.histos[0].th.GetNbinsX() + 1)
+            xMin, xMax = thHelper.nonempty_xrange([histos[0].th])
             self.mainPad.set_xrange(xMin, xMax)
             self.ratioPad.set_xrange(xMin, xMax)
 
@@ -384,8 +459,8 @@ class Comparison:
         self.mainPad.logx(doLog)
         self.ratioPad.logx(doLog)
 
-    def save(self, plotName: str, verbose=False):
-        self.canvas.save(plotName, verbose)
+    def save(self, plotName: str, verbose=False, **kwargs):
+        self.canvas.save(plotName, verbose, **kwargs)
 
 class Comparison_systematics:
     def __init__(
@@ -420,7 +495,8 @@ class Comparison_systematics:
         """ 
         Plots histograms and uncertainty bands as well as ratio with respect to truth.
         histos: [truth, unfolded, reco1, reco2]
-        bands: [h_statband, sys_band, hSystDownSum, hSystUpSum]
+        bands: [h_statband, sys_band, hSystUpSum, hSystDownSum],
+            e.g. from systematics.bands()
         """
         if len(histos) == 0:
             log.error("List of MC histograms is empty")
@@ -431,28 +507,7 @@ class Comparison_systematics:
 
         # get xmin, xmin, empty bins are cut away
         if self.nonEmpty:
-            xMin = histos[0].th.GetBinLowEdge(1)
-            xMax = histos[0].th.GetBinLowEdge(histos[0].th.GetNbinsX() + 1)
-            prevCont = False
-            minDone = False
-            maxDone = False
-            for i in range(histos[0].th.GetNbinsX()):
-                iBin = i + 1
-                if (
-                    histos[0].th.GetBinContent(iBin) == 0
-                    and self.histos[0].th.GetBinContent(iBin) == 0
-                ):
-                    if not minDone:
-                        xMin = histos[0].th.GetBinLowEdge(iBin + 1)
-                    if prevCont:
-                        xMax = histos[0].th.GetBinLowEdge(iBin)
-                        maxDone = True
-                    prevCont = False
-                else:
-                    minDone = True
-                    prevCont = True
-            if not maxDone:
-                xMax = histos[0].th.GetBinLowEdge(self.histos[0].th.GetNbinsX() + 1)
+            xMin, xMax = thHelper.nonempty_xrange([histos[0].th])
             self.mainPad.set_xrange(xMin, xMax)
             self.ratioPad.set_xrange(xMin, xMax)
 
@@ -557,47 +612,10 @@ class Comparison_systematics:
         self.mainPad.logx(doLog)
         self.ratioPad.logx(doLog)
 
-    def save(self, plotName: str, verbose=False):
-        self.canvas.save(plotName, verbose)
+    def save(self, plotName: str, verbose=False, **kwargs):
+        self.canvas.save(plotName, verbose, **kwargs)
 
 
     def get_syst_ratio_lines(self, hSystUpSum, hSystDownSum, denominator, suffix="_systRatio"):
         """ Returns result of up and down sytematics each divided by a denominator distribution"""
-        if hSystUpSum.GetNbinsX() != denominator.th.GetNbinsX():
-            log.error("Incompatible histograms!")
-            raise ValueError("Histogram bin counts do not match.")
-
-        # Clone to get shape and axis settings
-        h_ratio_up = denominator.th.Clone("ratio_up" + suffix)
-        h_ratio_down = denominator.th.Clone("ratio_down" + suffix)
-        h_ratio_up.Reset()
-        h_ratio_down.Reset()
-
-        for i in range(1, hSystUpSum.GetNbinsX() + 1):
-            denom_val = denominator.th.GetBinContent(i)
-
-            if denom_val != 0:
-                up_val = hSystUpSum.GetBinContent(i)
-                down_val = hSystDownSum.GetBinContent(i)
-
-                h_ratio_up.SetBinContent(i, up_val / denom_val)
-                h_ratio_down.SetBinContent(i, down_val / denom_val)
-            else:
-                h_ratio_up.SetBinContent(i, 0)
-                h_ratio_down.SetBinContent(i, 0)
-
-            h_ratio_up.SetBinError(i, 0)
-            h_ratio_down.SetBinError(i, 0)
-
-        # Style
-        h_ratio_up.SetLineColor(ROOT.kBlack)
-        h_ratio_up.SetLineWidth(2)
-        h_ratio_up.SetLineStyle(ROOT.kSolid)
-        h_ratio_up.SetMarkerSize(0)
-
-        h_ratio_down.SetLineColor(ROOT.kBlack)
-        h_ratio_down.SetLineWidth(2)
-        h_ratio_down.SetLineStyle(ROOT.kSolid)
-        h_ratio_down.SetMarkerSize(0)
-
-        return h_ratio_up, h_ratio_down
+        return syst_ratio_lines(hSystUpSum, hSystDownSum, denominator.th, suffix)
@@ -0,0 +1,246 @@
+from .collection import collection, SuperCollection, normalizationHelper
+from . import thHelper
+import ROOT
+from ROOT import TH1, TGraphAsymmErrors
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Combination of systematic variations into uncertainty bands.
+
+Nominal histogram and all variations are read from the collection
+in a single pass over the datasets (collection.get_ths). Shifts of
+the variations are stacked into numpy arrays (variation x bin)
+and combined in quadrature or as envelope. The results are provided
+in the form expected by presets.Comparison_systematics.
+"""
+
+# a variation is either one histogram (symmetrized)
+# or a pair of histograms (up, down)
+Variation = Union[str, Tuple[str, str]]
+
+METHODS = ("quadrature", "envelope")
+
+
+def variation_names(histoName: str, directories: Sequence[str], nominalDir: str = "") -> List[str]:
+    """Returns names of the histogram in variation directories,
+    e.g. ("ptll", ["JES_up", "JES_down"]) -> ["JES_up/ptll", "JES_down/ptll"]
+
+    Arguments:
+        histoName (``str``): name of the nominal histogram
+        directories (``Sequence[str]``): directories of the variations
+        nominalDir (``str``): directory of the nominal histogram,
+            which is replaced by the variation directories
+    """
+    if nominalDir != "":
+        if not histoName.startswith(nominalDir + "/"):
+            log.error(f"Histogram {histoName} is not in directory {nominalDir}!")
+            raise RuntimeError
+        histoName = histoName[len(nominalDir) + 1:]
+    return [f"{directory}/{histoName}" for directory in directories]
+
+
+def syst_ratio_lines(
+    hSystUpSum: TH1, hSystDownSum: TH1, denominator: TH1, suffix: str = "_systRatio"
+) -> Tuple[TH1, TH1]:
+    """Returns up and down systematics each divided by the denominator
+
+    Arguments:
+        hSystUpSum (``TH1``): nominal + total up uncertainty
+        hSystDownSum (``TH1``): nominal - total down uncertainty
+        denominator (``TH1``): histogram to divide by
+        suffix (``str``): suffix of names of the new histograms
+    """
+    if hSystUpSum.GetNbinsX() != denominator.GetNbinsX():
+        log.error("Incompatible histograms!")
+        raise ValueError("Histogram bin counts do not match.")
+
+    # Clone to get shape and axis settings
+    h_ratio_up = denominator.Clone("ratio_up" + suffix)
+    h_ratio_down = denominator.Clone("ratio_down" + suffix)
+    h_ratio_up.Reset()
+    h_ratio_down.Reset()
+
+    last = hSystUpSum.GetNbinsX() + 1
+    denom_vals = thHelper.get_contents(denominator)[1:last].astype(np.float64)
+    zeros = np.zeros(last - 1)
+    for h_ratio, hSyst in ((h_ratio_up, hSystUpSum), (h_ratio_down, hSystDownSum)):
+        syst_vals = thHelper.get_contents(hSyst)[1:last].astype(np.float64)
+        ratio_vals, _ = thHelper.divide_arrays(syst_vals, zeros, denom_vals)
+        thHelper.set_contents(h_ratio, ratio_vals, zeros, first=1)
+
+    # Style
+    for h_ratio in (h_ratio_up, h_ratio_down):
+        h_ratio.SetLineColor(ROOT.kBlack)
+        h_ratio.SetLineWidth(2)
+        h_ratio.SetLineStyle(ROOT.kSolid)
+        h_ratio.SetMarkerSize(0)
+
+    return h_ratio_up, h_ratio_down
+
+
+class systematics:
+    """Combines systematic variations of a histogram from a collection"""
+
+    def __init__(
+        self,
+        coll: Union[collection, SuperCollection],
+        nominalName: str,
+        variations: Sequence[Variation],
+        method: str = "quadrature",
+        symmetrize: bool = False,
+        norm: Optional[normalizationHelper] = None,
+        skipBad: bool = False,
+    ) -> None:
+        """
+        Arguments:
+            coll (``collection``): collection (or SuperCollection) with
+                nominal and varied histograms
+            nominalName (``str``): name/path of the nominal histogram
+            variations (``Sequence[Variation]``): names of the varied histograms,
+                single name is symmetrized, (up, down) pair is used as is,
+                see also variation_names
+            method (``str``): "quadrature" (sum of squares)
+                or "envelope" (maximum) of the variations
+            symmetrize (``bool``): if True, up and down shift of each
+                (up, down) variation are replaced by their average size
+            norm (``normalizationHelper``): normalization of the collection
+            skipBad (``bool``): skip bad files, see collection.get_th
+        """
+        if method not in METHODS:
+            log.error(f"Unknown method {method}, use one of {', '.join(METHODS)}")
+            raise RuntimeError
+        self.coll = coll
+        self.nominalName = nominalName
+        self.variations = list(variations)
+        self.method = method
+        self.symmetrize = symmetrize
+        self.norm = norm
+        self.skipBad = skipBad
+
+        self.nominal: Optional[TH1] = None
+        # total up and down uncertainty (positive), by global bin
+        self.up = np.empty(0)
+        self.down = np.empty(0)
+
+    def _pairs(self) -> List[Tuple[str, str]]:
+        return [(v, "") if isinstance(v, str) else (v[0], v[1]) for v in self.variations]
+
+    def compute(self, nThreads: int = 1) -> None:
+        """Reads nominal and all variations in one pass over the datasets
+        and combines them into total up and down uncertainties
+
+        Arguments:
+            nThreads (``int``): kept for compatibility, see collection.get_ths
+        """
+        pairs = self._pairs()
+        names = [self.nominalName] + [n for pair in pairs for n in pair if n != ""]
+        ths = self.coll.get_ths(names, self.norm, self.skipBad, nThreads)
+        # variations are checked when their shifts are computed
+        nominal = ths[self.nominalName]
+        if nominal is None:
+            log.error(f"Nominal {self.nominalName} not available in {self.coll.title}!")
+            raise RuntimeError
+        self.nominal = nominal
+        contents = thHelper.get_contents(nominal).astype(np.float64)
+        if len(pairs) == 0:
+            self.up = np.zeros_like(contents)
+            self.down = np.zeros_like(contents)
+            return
+        shiftsUp, shiftsDown = self._shifts(ths, pairs, contents)
+        self.up, self.down = self._combine(shiftsUp, shiftsDown)
+
+    def _shifts(
+        self, ths: Dict[str, Optional[TH1]], pairs: List[Tuple[str, str]], contents: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns positive sizes of upward and downward shifts,
+        as arrays (variation x bin)"""
+
+        def deltas(name: str) -> np.ndarray:
+            th = ths.get(name)
+            if th is None:
+                log.error(f"Variation {name} not available in {self.coll.title}!")
+                raise RuntimeError
+            if th.GetNcells() != len(contents):
+                log.error(f"Variation {name} has different binning than nominal!")
+                raise RuntimeError
+            return thHelper.get_contents(th).astype(np.float64) - contents
+
+        deltaUp = np.stack([deltas(up) for up, _ in pairs])
+        # single variation is mirrored
+        deltaDown = np.stack([deltas(down) if down != "" else -deltas(up) for up, down in pairs])
+
+        if self.symmetrize:
+            average = (np.abs(deltaUp) + np.abs(deltaDown)) / 2
+            return average, average
+        # each variation can shift the bin up and down at once or in the same direction
+        shiftsUp = np.maximum(np.maximum(deltaUp, deltaDown), 0)
+        shiftsDown = np.maximum(np.maximum(-deltaUp, -deltaDown), 0)
+        return shiftsUp, shiftsDown
+
+    def _combine(self, shiftsUp: np.ndarray, shiftsDown: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.method == "quadrature":
+            return np.sqrt(np.sum(shiftsUp**2, axis=0)), np.sqrt(np.sum(shiftsDown**2, axis=0))
+        return np.max(shiftsUp, axis=0), np.max(shiftsDown, axis=0)
+
+    def _check_computed(self) -> TH1:
+        if self.nominal is None:
+            log.error("Systematics not computed yet, call compute first!")
+            raise RuntimeError
+        return self.nominal
+
+    def syst_band(self, suffix: str = "_systband") -> TGraphAsymmErrors:
+        """Returns band of total systematic uncertainty around nominal
+
+        Arguments:
+            suffix (``str``): suffix of the name of the graph
+        """
+        nominal = self._check_computed()
+        nBins = nominal.GetNbinsX()
+        edges = thHelper.get_edges(nominal.GetXaxis())
+        centers = (edges[1:] + edges[:-1]) / 2
+        halfWidths = (edges[1:] - edges[:-1]) / 2
+        values = thHelper.get_contents(nominal).astype(np.float64)[1: nBins + 1]
+        band = TGraphAsymmErrors(
+            nBins,
+            np.ascontiguousarray(centers),
+            np.ascontiguousarray(values),
+            np.ascontiguousarray(halfWidths),
+            np.ascontiguousarray(halfWidths),
+            np.ascontiguousarray(self.down[1: nBins + 1]),
+            np.ascontiguousarray(self.up[1: nBins + 1]),
+        )
+        band.SetName(nominal.GetName() + suffix)
+        return band
+
+    def syst_sums(self) -> Tuple[TH1, TH1]:
+        """Returns nominal + total up and nominal - total down uncertainty"""
+        nominal = self._check_computed()
+        contents = thHelper.get_contents(nominal).astype(np.float64)
+        sums = []
+        for name, values in (("_systUpSum", contents + self.up), ("_systDownSum", contents - self.down)):
+            th = nominal.Clone(nominal.GetName() + name)
+            th.Reset()
+            thHelper.set_contents(th, values, np.zeros_like(values))
+            sums.append(th)
+        return sums[0], sums[1]
+
+    def bands(self) -> List:
+        """Returns [stat band, syst band, hSystUpSum, hSystDownSum]
+        as expected by presets.Comparison_systematics.add_and_plot"""
+        nominal = self._check_computed()
+        statBand = nominal.Clone(nominal.GetName() + "_statband")
+        hSystUpSum, hSystDownSum = self.syst_sums()
+        return [statBand, self.syst_band(), hSystUpSum, hSystDownSum]
+
+    def ratio_lines(self, denominator: TH1) -> Tuple[TH1, TH1]:
+        """Returns nominal +/- total uncertainty divided by the denominator
+
+        Arguments:
+            denominator (``TH1``): histogram to divide by
+        """
+        hSystUpSum, hSystDownSum = self.syst_sums()
+        return syst_ratio_lines(hSystUpSum, hSystDownSum, denominator)
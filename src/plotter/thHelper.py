@@ -2,7 +2,11 @@ from ROOT import TH1, TGraph
 import ROOT
 from array import array
 from math import sqrt
-from typing import List
+from typing import List, Optional, Tuple
+import numpy as np
+
+# array kernels are shared with npHisto
+from .nphisto import divide_arrays, match_edges, rebin_array  # NOQA
 
 import logging
 
@@ -12,8 +16,133 @@ log = logging.getLogger(__name__)
 
 divide_ratio: divide function where error of the denominator
     is not takein into account.
+
+Bin contents and errors can be accessed as numpy arrays with
+get_contents/get_sumw2 (zero-copy view where possible)
+and written back in bulk with set_contents.
 """
 
+# numpy types of the TArray base of TH1, profiles are excluded
+# as their content is not directly stored in the array
+_ARRAY_DTYPES = (("TArrayD", np.float64), ("TArrayF", np.float32))
+_PROFILES = ("TProfile", "TProfile2D", "TProfile3D")
+
+
+def _array_dtype(th: TH1) -> Optional[type]:
+    """Returns numpy type of the underlying array of the histogram
+    or None if the array cannot be used directly"""
+    if any(th.InheritsFrom(p) for p in _PROFILES):
+        return None
+    for base, dtype in _ARRAY_DTYPES:
+        if th.InheritsFrom(base):
+            return dtype
+    return None
+
+
+def _view(ptr, size: int, dtype: type) -> np.ndarray:
+    """Numpy view of the C++ buffer without copy"""
+    ptr.reshape((size,))
+    return np.frombuffer(ptr, dtype=dtype, count=size)
+
+
+def _has_normal_errors(th: TH1) -> bool:
+    """True if errors follow sqrt(sumw2) (or sqrt(|content|) without sumw2)"""
+    return th.GetBinErrorOption() == ROOT.TH1.kNormal
+
+
+def get_contents(th: TH1) -> np.ndarray:
+    """Get bin contents of the histogram, including under/overflow,
+    as numpy array indexed by global bin number.
+
+    For TH1D/TH1F (and 2D/3D variants) the array is a view
+    of the histogram content, so modifying it modifies the histogram.
+    Otherwise a copy is returned.
+
+    Arguments:
+        th (``TH1``): target histogram
+    """
+    nCells = th.GetNcells()
+    dtype = _array_dtype(th)
+    if dtype is not None:
+        return _view(th.GetArray(), nCells, dtype)
+    return np.array([th.GetBinContent(i) for i in range(nCells)], dtype=np.float64)
+
+
+def get_sumw2(th: TH1) -> np.ndarray:
+    """Get squared bin errors of the histogram, including under/overflow,
+    as numpy array indexed by global bin number.
+
+    If the histogram stores sum of squared weights the array is
+    a view of it, otherwise a copy is returned.
+
+    Arguments:
+        th (``TH1``): target histogram
+    """
+    nCells = th.GetNcells()
+    if _array_dtype(th) is not None and _has_normal_errors(th):
+        if th.GetSumw2N() == nCells:
+            return _view(th.GetSumw2().GetArray(), nCells, np.float64)
+        return np.abs(get_contents(th)).astype(np.float64)
+    return np.array([th.GetBinError(i) ** 2 for i in range(nCells)], dtype=np.float64)
+
+
+def get_errors(th: TH1) -> np.ndarray:
+    """Get bin errors of the histogram, including under/overflow,
+    as numpy array (always a copy).
+
+    Arguments:
+        th (``TH1``): target histogram
+    """
+    return np.sqrt(get_sumw2(th))
+
+
+def set_contents(
+    th: TH1,
+    contents: np.ndarray,
+    errors: Optional[np.ndarray] = None,
+    first: int = 0,
+    sumw2: Optional[np.ndarray] = None,
+) -> None:
+    """Sets bin contents (and errors) in bulk,
+    starting from global bin first.
+
+    Arguments:
+        th (``TH1``): target histogram (modified)
+        contents (``np.ndarray``): new bin contents
+        errors (``np.ndarray``): new bin errors,
+            if None errors are not modified
+        first (``int``): global bin of the first element
+        sumw2 (``np.ndarray``): new squared bin errors,
+            alternative to errors
+    """
+    last = first + len(contents)
+    if first < 0 or last > th.GetNcells():
+        log.error("Arrays do not fit into the histogram!")
+        raise ValueError
+    if errors is not None:
+        if sumw2 is not None:
+            log.error("Provide either errors or sumw2, not both!")
+            raise ValueError
+        errors = np.asarray(errors, dtype=np.float64)
+        sumw2 = errors * errors
+
+    if _array_dtype(th) is None:
+        for i in range(len(contents)):
+            th.SetBinContent(first + i, contents[i])
+            if sumw2 is not None:
+                th.SetBinError(first + i, sqrt(sumw2[i]))
+        return
+
+    get_contents(th)[first:last] = contents
+    if sumw2 is not None:
+        # same as SetBinError, which creates sumw2 if not present
+        if th.GetSumw2N() == 0:
+            th.Sumw2()
+        thSumw2 = _view(th.GetSumw2().GetArray(), th.GetNcells(), np.float64)
+        thSumw2[first:last] = sumw2
+    # statistics have to be recomputed from the new contents
+    th.ResetStats()
+
 
 def divide_ratio(numTH: TH1, denTH: TH1) -> None:
     """For ratio, we do not to take into account
@@ -32,61 +161,158 @@ def divide_ratio(numTH: TH1, denTH: TH1) -> None:
         log.error("Incompatible histograms!")
         raise ValueError
 
-    for i in range(numTH.GetNbinsX()):
-        iBin = i + 1
-        otherVal = denTH.GetBinContent(iBin)
+    # only the visible bins (1..N) are divided
+    last = numTH.GetNbinsX() + 1
+    num = get_contents(numTH)[1:last].astype(np.float64)
+    numErr = get_errors(numTH)[1:last]
+    den = get_contents(denTH)[1:last].astype(np.float64)
 
-        # to divide the value has to be non-zero:
-        if otherVal:
-            newVal = numTH.GetBinContent(iBin) / otherVal
-            newErr = numTH.GetBinError(iBin) / otherVal
-        # otherwise we set content to 0
-        # TODO: issue a warning? debug?
-        else:
-            newVal = 0
-            newErr = 0
+    # to divide the value has to be non-zero,
+    # otherwise we set content to 0
+    # TODO: issue a warning? debug?
+    newVal, newErr = divide_arrays(num, numErr, den)
+    set_contents(numTH, newVal, newErr, first=1)
 
-        numTH.SetBinContent(iBin, newVal)
-        numTH.SetBinError(iBin, newErr)
 
+def nonempty_xrange(
+    ths: List[TH1], threshold: float = 0, padding: int = 0
+) -> Tuple[float, float]:
+    """Get x-range from the low edge of the first to the high edge
+    of the last bin where any of the histograms is non-empty.
+    Full range is returned if all bins are empty.
+
+    Arguments:
+        ths (``List[TH1]``): histograms with the same x-binning
+        threshold (``float``): bins with |content| <= threshold are empty
+        padding (``int``): number of bins added on both sides
+    """
+    nBins = ths[0].GetNbinsX()
+    if any(th.GetNbinsX() != nBins for th in ths):
+        log.error("Histograms have different number of bins!")
+        raise ValueError
+    edges = get_edges(ths[0].GetXaxis())
+    contents = np.stack([get_contents(th)[1: nBins + 1] for th in ths])
+    nonEmpty = np.flatnonzero(np.any(np.abs(contents) > threshold, axis=0))
+    if len(nonEmpty) == 0:
+        return float(edges[0]), float(edges[-1])
+    first = max(nonEmpty[0] - padding, 0)
+    last = min(nonEmpty[-1] + padding, nBins - 1)
+    return float(edges[first]), float(edges[last + 1])
 
-def rebin(TH: ROOT.TH1, binning: List[float], norm_by_width: bool = False) -> ROOT.TH1:
+
+def _same_arrays(ths: List[TH1]) -> bool:
+    """True if histograms have the same type of arrays and the same binning"""
+    first = ths[0]
+    dtype = _array_dtype(first)
+    if dtype is None:
+        return False
+    for th in ths[1:]:
+        if _array_dtype(th) is not dtype or th.GetNcells() != first.GetNcells():
+            return False
+        if th.GetDimension() != first.GetDimension() or not _has_normal_errors(th):
+            return False
+        for axis in ("GetXaxis", "GetYaxis", "GetZaxis"):
+            edges = get_edges(getattr(th, axis)())
+            if not np.array_equal(edges, get_edges(getattr(first, axis)())):
+                return False
+    return _has_normal_errors(first)
+
+
+def stack_cumulative(ths: List[TH1]) -> None:
+    """Turns histograms into stack, each histogram becomes sum of itself
+    and all following histograms (as drawn in a stacked plot).
+
+    Done in a single pass, for histograms with the same binning
+    as cumulative sum over numpy array of all contents.
+
+    Arguments:
+        ths (``List[TH1]``): histograms (modified), top of the stack first
+    """
+    if len(ths) < 2:
+        return
+
+    if not _same_arrays(ths):
+        for i in range(len(ths) - 2, -1, -1):
+            ths[i].Add(ths[i + 1])
+        return
+
+    contents = np.cumsum(np.stack([get_contents(th) for th in ths])[::-1], axis=0)[::-1]
+    sumw2 = None
+    if any(th.GetSumw2N() for th in ths):
+        sumw2 = np.cumsum(np.stack([get_sumw2(th) for th in ths])[::-1], axis=0)[::-1]
+    entries = np.cumsum([th.GetEntries() for th in ths][::-1])[::-1]
+    for i, th in enumerate(ths):
+        set_contents(th, contents[i], sumw2=None if sumw2 is None else sumw2[i])
+        # same as TH1::Add
+        th.SetEntries(entries[i])
+
+
+def get_edges(axis: ROOT.TAxis) -> np.ndarray:
+    """Get bin edges of the axis as numpy array
+
+    Arguments:
+        axis (``TAxis``): target axis
+    """
+    nBins = axis.GetNbins()
+    xBins = axis.GetXbins()
+    if xBins.GetSize() == nBins + 1:
+        return _view(xBins.GetArray(), nBins + 1, np.float64).copy()
+    # same arithmetic as TAxis::GetBinLowEdge for fix binning
+    width = (axis.GetXmax() - axis.GetXmin()) / nBins
+    return axis.GetXmin() + np.arange(nBins + 1) * width
+
+
+def rebin(
+    TH: ROOT.TH1,
+    binning: List[float],
+    norm_by_width: bool = False,
+    ybinning: Optional[List[float]] = None,
+    zbinning: Optional[List[float]] = None,
+) -> ROOT.TH1:
     """Returns rebinned copy of histogram based on provided binning.
-    Only 1D for now
+    New bins have to be combinations of the original bins.
+    Works for 1D, 2D and 3D histograms, for 2D/3D the axes
+    without new binning are kept.
+
     Arguments:
         binning (``list``): list of bin edges
         norm_by_width (``bool``): whether to normalize by bin width
+        ybinning (``list``): list of bin edges of the y-axis
+        zbinning (``list``): list of bin edges of the z-axis
     """
     name = "Rebin" + TH.GetName()
+    nDim = TH.GetDimension()
+    axes = [TH.GetXaxis(), TH.GetYaxis(), TH.GetZaxis()][:nDim]
+    newBinnings = [binning, ybinning, zbinning][:nDim]
+
+    # contents of global bins are ordered as [z][y][x]
+    shape = tuple(ax.GetNbins() + 2 for ax in reversed(axes))
+    contents = get_contents(TH).astype(np.float64).reshape(shape)
+    sumw2 = get_sumw2(TH).reshape(shape)
+
+    newEdges = []
+    for iAxis, (ax, newBinning) in enumerate(zip(axes, newBinnings)):
+        oldEdges = get_edges(ax)
+        if newBinning is None:
+            newEdges.append(oldEdges)
+            continue
+        # check binning compatibility
+        matched = match_edges(oldEdges, np.asarray(newBinning, dtype=np.float64))
+        newEdges.append(np.asarray(newBinning, dtype=np.float64))
+        contents = rebin_array(contents, matched, axis=-1 - iAxis)
+        sumw2 = rebin_array(sumw2, matched, axis=-1 - iAxis)
+
+    constructor = [ROOT.TH1D, ROOT.TH2D, ROOT.TH3D][nDim - 1]
+    args = []
+    for edges in newEdges:
+        args += [len(edges) - 1, array('d', edges)]
     # Supress warning for replacing histogram
     ignore_level = ROOT.gErrorIgnoreLevel
     ROOT.gErrorIgnoreLevel = ROOT.kError
-    reb_hist = ROOT.TH1D(name, name, len(binning) - 1, array('d', binning))
+    reb_hist = constructor(name, name, *args)
     ROOT.gErrorIgnoreLevel = ignore_level
     reb_hist.Sumw2()
-    # check binning compatibility
-    for n in range(reb_hist.GetNbinsX() + 1):
-        new_edge = reb_hist.GetBinLowEdge(n + 1)
-        found_edge = False
-        for o in range(TH.GetNbinsX() + 1):
-            oldEdge = TH.GetBinLowEdge(o + 1)
-            epsilon = TH.GetBinWidth(o + 1) / 1000
-            if abs(oldEdge - new_edge) < epsilon:
-                found_edge = True
-        if not found_edge:
-            raise RuntimeError(
-                'Provided binning does not match '
-                'bins of the current histogram and rebinning is not possible! '
-                'New bins have to be combinations of bins the original '
-                'histogram.'
-            )
-    for old_bin in range(TH.GetNbinsX() + 2):
-        new_bin = reb_hist.FindBin(TH.GetBinCenter(old_bin))
-        reb_hist.SetBinContent(
-            new_bin, TH.GetBinContent(old_bin) + reb_hist.GetBinContent(new_bin)
-        )
-        error = TH.GetBinError(old_bin) ** 2 + reb_hist.GetBinError(new_bin) ** 2
-        reb_hist.SetBinError(new_bin, sqrt(error))
+    set_contents(reb_hist, contents.ravel(), sumw2=sumw2.ravel())
     if norm_by_width:
         reb_hist.Scale(1, "width")
     return reb_hist
@@ -128,6 +354,24 @@ def divide_ratio_graph(num: TGraph, den: TGraph) -> None:
             dRem += 1
 
 
+def get_graph_arrays(g: TGraph) -> List[np.ndarray]:
+    """Get x and y of the graph points as numpy arrays (copies),
+    followed by their errors for TGraphErrors and TGraphAsymmErrors
+
+    Arguments:
+        g (``TGraph``):  target graph
+    """
+    getters = ["GetX", "GetY"]
+    if g.InheritsFrom("TGraphAsymmErrors"):
+        getters += ["GetEXlow", "GetEXhigh", "GetEYlow", "GetEYhigh"]
+    elif g.InheritsFrom("TGraphErrors"):
+        getters += ["GetEX", "GetEY"]
+    n = g.GetN()
+    if n == 0:
+        return [np.empty(0) for _ in getters]
+    return [_view(getattr(g, getter)(), n, np.float64).copy() for getter in getters]
+
+
 def get_graph_minimum(g: TGraph) -> float:
     """ Get minimum of a graph
 
@@ -136,7 +380,7 @@ def get_graph_minimum(g: TGraph) -> float:
     """
     if g.GetN() == 0:
         return -1111
-    return min(g.GetY())
+    return float(np.min(get_graph_arrays(g)[1]))
 
 
 def get_graph_maximum(g: TGraph) -> float:
@@ -147,7 +391,60 @@ def get_graph_maximum(g: TGraph) -> float:
     """
     if g.GetN() == 0:
         return -1111
-    return max(g.GetY())
+    return float(np.max(get_graph_arrays(g)[1]))
+
+
+def _graph_y_errors(g: TGraph, arrays: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Low and high y errors from get_graph_arrays"""
+    if g.InheritsFrom("TGraphAsymmErrors"):
+        return arrays[4], arrays[5]
+    if g.InheritsFrom("TGraphErrors"):
+        return arrays[3], arrays[3]
+    return np.zeros_like(arrays[1]), np.zeros_like(arrays[1])
+
+
+def _extrema(low: np.ndarray, high: np.ndarray) -> Tuple[float, float, float]:
+    # same as TH1::GetMinimum(0) if there is no positive value
+    positive = low[low > 0]
+    minPositive = float(np.min(positive)) if len(positive) else float(np.finfo(np.float32).max)
+    return float(np.min(low)), minPositive, float(np.max(high))
+
+
+def get_extrema(th, withErrors: bool = False) -> Tuple[float, float, float]:
+    """Get minimum, minimum of positive values and maximum in one pass.
+
+    For TH1 the same as GetMinimum(), GetMinimum(0) and GetMaximum()
+    (bins in the x-axis range), except that minimum/maximum
+    stored in the histogram are not taken into account.
+    For 2D/3D histograms GetMinimum/GetMaximum are used directly
+    (errors are ignored).
+    For TGraph computed from y of the points, -1111 for empty graph.
+
+    Arguments:
+        th (``TH1/TGraph``): target histogram or graph
+        withErrors (``bool``): if True, extrema of value -/+ error
+    """
+    if th.InheritsFrom("TGraph"):
+        if th.GetN() == 0:
+            return -1111, -1111, -1111
+        arrays = get_graph_arrays(th)
+        y = arrays[1]
+        if not withErrors:
+            return _extrema(y, y)
+        errLow, errHigh = _graph_y_errors(th, arrays)
+        return _extrema(y - errLow, y + errHigh)
+
+    axis = th.GetXaxis()
+    first, last = axis.GetFirst(), axis.GetLast()
+    if th.GetDimension() > 1 or first > last:
+        # errors are not taken into account here
+        return th.GetMinimum(), th.GetMinimum(0), th.GetMaximum()
+
+    contents = get_contents(th)[first: last + 1]
+    if not withErrors:
+        return _extrema(contents, contents)
+    errors = get_errors(th)[first: last + 1]
+    return _extrema(contents - errors, contents + errors)
 
 
 def get_th1_error_as_hist(th1: TH1):
@@ -166,7 +463,9 @@ def get_th1_error_as_hist(th1: TH1):
     th1_error_down = th1.Clone()
     th1_error_down.SetName(th1.GetName() + '_error_down')
     th1_error_down.Reset()
-    for i in range(1, th1.GetNbinsX()+1):
-        th1_error_up.SetBinContent(i, th1.GetBinContent(i) + th1.GetBinError(i))
-        th1_error_down.SetBinContent(i, th1.GetBinContent(i) - th1.GetBinError(i))
+    last = th1.GetNbinsX() + 1
+    contents = get_contents(th1)[1:last].astype(np.float64)
+    errors = get_errors(th1)[1:last]
+    set_contents(th1_error_up, contents + errors, first=1)
+    set_contents(th1_error_down, contents - errors, first=1)
     return th1_error_up, th1_error_down
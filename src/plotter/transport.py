@@ -0,0 +1,203 @@
+from .histo import histo
+from . import thHelper
+import ROOT
+from ROOT import TH1
+from typing import Any, List, Optional, Union
+import numpy as np
+import sys
+
+import logging
+
+log = logging.getLogger(__name__)
+
+""" Exchange of histograms between processes through shared memory.
+
+Histogram is written once into a shared memory block: small header
+(dimension, number of bins, name and title) followed by axis edges,
+bin contents and sum of squared weights as float64 arrays.
+Other processes attach to the block by its name and get numpy views
+of the arrays, TH1 is created only when requested (to_th1).
+Pickled sharedHisto is just the name of the block, so it can be passed
+to worker processes cheaply. Requires python 3.8 (multiprocessing.shared_memory).
+"""
+
+_MAGIC = 0x504C4F54  # "PLOT"
+# magic, dimension, nBinsX, nBinsY, nBinsZ, hasSumw2, name length, title length
+_HEADER_SIZE = 8
+_TH_CLASSES = {1: "TH1D", 2: "TH2D", 3: "TH3D"}
+
+
+def _padded(nBytes: int) -> int:
+    """Number of float64 needed to hold nBytes"""
+    return (nBytes + 7) // 8
+
+
+def _buffer(shm: Any) -> memoryview:
+    """Returns buffer of the block, raises error if the block is closed"""
+    buf = shm.buf
+    if buf is None:
+        log.error(f"Shared memory {shm.name} is closed!")
+        raise RuntimeError
+    return buf
+
+
+class sharedHisto:
+    """Histogram stored in a shared memory block"""
+
+    def __init__(self, shm: Any, owner: bool) -> None:
+        """Use share or attach instead
+
+        Arguments:
+            shm (``SharedMemory``): the memory block
+            owner (``bool``): if True, block is removed by unlink
+        """
+        self.shm = shm
+        self.owner = owner
+        self._parse()
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block"""
+        return self.shm.name
+
+    def _parse(self) -> None:
+        buf = _buffer(self.shm)
+        header = np.frombuffer(buf, dtype=np.int64, count=_HEADER_SIZE)
+        magic, dimension, nx, ny, nz, hasSumw2, nameLen, titleLen = (int(v) for v in header)
+        if magic != _MAGIC:
+            log.error(f"Shared memory {self.shm.name} does not contain histogram!")
+            raise RuntimeError
+        offset = _HEADER_SIZE * 8
+        strings = bytes(buf[offset: offset + nameLen + titleLen])
+        self.thName, self.thTitle = strings[:nameLen].decode(), strings[nameLen:].decode()
+        offset += _padded(nameLen + titleLen) * 8
+
+        self.dimension = dimension
+        self.nBins = [nx, ny, nz][:dimension]
+        self.edges: List[np.ndarray] = []
+        for n in self.nBins:
+            self.edges.append(np.frombuffer(buf, dtype=np.float64, count=n + 1, offset=offset))
+            offset += (n + 1) * 8
+        nCells = (nx + 2) * (ny + 2 if dimension > 1 else 1) * (nz + 2 if dimension > 2 else 1)
+        self.contents = np.frombuffer(buf, dtype=np.float64, count=nCells, offset=offset)
+        offset += nCells * 8
+        self.sumw2: Optional[np.ndarray] = None
+        if hasSumw2:
+            self.sumw2 = np.frombuffer(buf, dtype=np.float64, count=nCells, offset=offset)
+
+    @classmethod
+    def share(cls, h: Union[histo, TH1]) -> "sharedHisto":
+        """Copies histogram into a new shared memory block,
+        the caller owns the block and has to unlink it
+
+        Arguments:
+            h (``histo/TH1``): histogram to share
+        """
+        from multiprocessing import shared_memory
+
+        th = h.th if isinstance(h, histo) else h
+        dimension = th.GetDimension()
+        axes = [th.GetXaxis(), th.GetYaxis(), th.GetZaxis()][:dimension]
+        edges = [thHelper.get_edges(axis) for axis in axes]
+        contents = thHelper.get_contents(th)
+        hasSumw2 = th.GetSumw2N() > 0
+        name, title = th.GetName().encode(), th.GetTitle().encode()
+        strings = name + title
+
+        nBins = [len(e) - 1 for e in edges] + [0] * (3 - dimension)
+        header = [_MAGIC, dimension] + nBins + [int(hasSumw2), len(name), len(title)]
+        arrays = edges + [contents] + ([thHelper.get_sumw2(th)] if hasSumw2 else [])
+        size = (_HEADER_SIZE + _padded(len(strings)) + sum(len(a) for a in arrays)) * 8
+
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        buf = _buffer(shm)
+        np.frombuffer(buf, dtype=np.int64, count=_HEADER_SIZE)[:] = header
+        offset = _HEADER_SIZE * 8
+        buf[offset: offset + len(strings)] = strings
+        offset += _padded(len(strings)) * 8
+        for array in arrays:
+            np.frombuffer(buf, dtype=np.float64, count=len(array), offset=offset)[:] = array
+            offset += len(array) * 8
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "sharedHisto":
+        """Attaches to an existing block (no copy of the data)
+
+        Arguments:
+            name (``str``): name of the shared memory block
+        """
+        from multiprocessing import shared_memory
+
+        # the block is owned (and removed) by the process which shared it,
+        # resource tracker of this process must not remove it at exit
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            from multiprocessing import resource_tracker
+
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        return cls(shm, owner=False)
+
+    def __reduce__(self):
+        return (sharedHisto.attach, (self.name,))
+
+    def to_th1(self, name: Optional[str] = None) -> TH1:
+        """Creates TH1D/TH2D/TH3D with the shared contents (copied into ROOT)
+
+        Arguments:
+            name (``str``): name of the new histogram, the original by default
+        """
+        binning: List[Any] = []
+        for n, edges in zip(self.nBins, self.edges):
+            binning += [n, np.ascontiguousarray(edges)]
+        th = getattr(ROOT, _TH_CLASSES[self.dimension])(
+            name if name is not None else self.thName, self.thTitle, *binning
+        )
+        th.SetDirectory(ROOT.nullptr)
+        if self.sumw2 is not None:
+            thHelper.set_contents(th, self.contents, sumw2=self.sumw2)
+        else:
+            thHelper.set_contents(th, self.contents)
+        return th
+
+    def to_histo(self, title: Optional[str] = None, **histoKwargs: Any) -> histo:
+        """Creates histo with the shared contents
+
+        Arguments:
+            title (``str``): title of the histo, the original title by default
+            histoKwargs: other arguments of histo (e.g. linecolor, configPath)
+        """
+        return histo(title if title is not None else self.thTitle, self.to_th1(), **histoKwargs)
+
+    def close(self) -> None:
+        """Detaches from the block, arrays cannot be used afterwards"""
+        # views have to be released before the block is closed
+        self.edges = []
+        self.contents = np.empty(0)
+        self.sumw2 = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Closes and removes the block, only by the owner"""
+        if not self.owner:
+            log.error("Only owner can unlink shared histogram!")
+            raise RuntimeError
+        self.close()
+        if sys.version_info < (3, 13):
+            from multiprocessing import resource_tracker
+
+            # attach in a child sharing our resource tracker unregisters the block,
+            # register again (no-op if registered) so that unlink can unregister it
+            resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+
+    def __enter__(self) -> "sharedHisto":
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        if self.owner:
+            self.unlink()
+        else:
+            self.close()
@@ -1,16 +1,34 @@
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
+import csv
+import hashlib
+import os
+import numpy as np
 
 import logging
 
 log = logging.getLogger(__name__)
 
 
+# incremented on every change of _xs or _xsDict,
+# xsReader rebuilds its columns only when it changed
+_modifications = 0
+
+
+def _modified() -> None:
+    global _modifications
+    _modifications += 1
+
+
 class _xs:
     def __init__(self) -> None:
         self.XS = 1.0
         self.kFactor = 1.0
         self.filtEff = 1.0
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        _modified()
+        super().__setattr__(name, value)
+
     def get_xs(self):
         return self.XS * self.kFactor * self.filtEff
 
@@ -20,9 +38,111 @@ class _xs:
         return self.get_xs() - other.get_xs() == 0
 
 
+class _xsDict(dict):
+    """dict which records its modifications, see _modified"""
+
+    def __setitem__(self, key, value) -> None:
+        _modified()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        _modified()
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        _modified()
+        return super().pop(*args)
+
+    def popitem(self):
+        _modified()
+        return super().popitem()
+
+    def clear(self) -> None:
+        _modified()
+        super().clear()
+
+    def update(self, *args, **kwargs) -> None:
+        _modified()
+        super().update(*args, **kwargs)
+
+    def setdefault(self, *args):
+        _modified()
+        return super().setdefault(*args)
+
+
 class xsReader:
-    def __init__(self) -> None:
-        self.XSsection: Dict[str, _xs] = {}
+    """Reads cross-section files (PMG format, comma separated
+    DSID, cross-section, k-factor, filter efficiency, ...).
+
+    Values are stored as columns sorted by DSID, so that
+    many DSIDs can be looked up at once with get_xs_many.
+    XSsection (dict of _xs by DSID) is created on first access,
+    afterwards it is used as the source of all values,
+    so it can be modified as before. The columns are rebuilt
+    from it only after it (or any _xs) is modified.
+    """
+
+    def __init__(self, cacheDir: Optional[str] = None) -> None:
+        """
+        Arguments:
+            cacheDir (``str``): if provided, parsed files are stored there
+                as binary snapshots (keyed by hash of the file content)
+                and loaded from there the next time
+        """
+        self.cacheDir = cacheDir
+        # sorted DSIDs and corresponding XS, k-factor and filter efficiency
+        self._dsids = np.array([], dtype=str)
+        self._values = np.empty((0, 3), dtype=np.float64)
+        self._XSsection: Optional[Dict[str, _xs]] = None
+        # value of _modifications when the columns were built from XSsection
+        self._builtAt = -1
+        # DSID -> row of the columns, for single lookups
+        self._rows: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        if self._XSsection is not None:
+            return len(self._XSsection)
+        return len(self._dsids)
+
+    @staticmethod
+    def _make_xs(XS: float, kFactor: float, filtEff: float) -> _xs:
+        xs = _xs()
+        xs.XS = XS
+        xs.kFactor = kFactor
+        xs.filtEff = filtEff
+        return xs
+
+    @property
+    def XSsection(self) -> Dict[str, _xs]:
+        """All cross-sections by DSID, created on first access.
+        The dict (and its _xs) can be modified, changes are used
+        by all following lookups and add_file."""
+        if self._XSsection is None:
+            self._XSsection = _xsDict(
+                (dsid, self._make_xs(*values))
+                for dsid, values in zip(self._dsids.tolist(), self._values.tolist())
+            )
+            self._builtAt = _modifications
+        return self._XSsection
+
+    @XSsection.setter
+    def XSsection(self, XSsection: Dict[str, _xs]) -> None:
+        """Assigned dict is copied, modify reader.XSsection afterwards"""
+        self._XSsection = XSsection if isinstance(XSsection, _xsDict) else _xsDict(XSsection)
+
+    def _columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted DSIDs and their values, rebuilt from XSsection
+        if it was modified since they were built"""
+        if self._XSsection is not None and self._builtAt != _modifications:
+            self._builtAt = _modifications
+            self._rows = None
+            dsids = sorted(self._XSsection)
+            self._dsids = np.array(dsids, dtype=str)
+            self._values = np.array(
+                [[xs.XS, xs.kFactor, xs.filtEff] for xs in (self._XSsection[d] for d in dsids)],
+                dtype=np.float64,
+            ).reshape(-1, 3)
+        return self._dsids, self._values
 
     def add_files(self, filePaths: List[str]):
         for filePath in filePaths:
@@ -36,38 +156,144 @@ class xsReader:
             return 1
         return float(new_str)
 
-    def add_file(self, filePath: str) -> None:
+    @staticmethod
+    def _parse_file(filePath: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Parses the file into column of DSIDs and
+        columns of XS, k-factor and filter efficiency"""
         with open(filePath, "r") as xsFile:
-            for line in xsFile.readlines():
-                if line == "" or line[0] == "#" or "SampleID" in line:
-                    continue
-                split = line.split(",")
-                if len(split) < 7:
-                    continue
-                dsid = split[0].strip()
-                xs = _xs()
-                xs.XS = xsReader.string2float(f"DSID {dsid} XS: ", split[1])
-                xs.kFactor = xsReader.string2float(
-                    f"DSID {dsid} k-factor: ", split[2]
-                )
-                xs.filtEff = xsReader.string2float(
-                    f"DSID {dsid} filter efficiency: ", split[3]
-                )
-                if dsid in self.XSsection.keys():
-                    if self.XSsection[dsid] == xs:
-                        log.warning(f"DSID {dsid} already in XSsection, skipping!")
-                        continue
-                    else:
-                        log.error(f"DSID {dsid} already in XSsection and has different XS!")
-                        raise RuntimeError
-                self.XSsection[dsid] = xs
+            lines = (
+                line for line in xsFile
+                if line != "" and line[0] != "#" and "SampleID" not in line
+            )
+            rows = [row[:4] for row in csv.reader(lines) if len(row) >= 7]
+
+        if len(rows) == 0:
+            return np.array([], dtype=str), np.empty((0, 3), dtype=np.float64)
+
+        table = np.char.strip(np.array(rows, dtype=str))
+        dsids = table[:, 0]
+        strValues = table[:, 1:]
+        isNull = strValues == "NULL"
+        if np.any(isNull):
+            nullDSIDs = dsids[np.any(isNull, axis=1)]
+            log.warning(
+                f"{filePath}: {len(nullDSIDs)} DSIDs with `NULL` values, using 1!"
+            )
+            log.debug(f"DSIDs with `NULL` values: {', '.join(nullDSIDs.tolist())}")
+        values = np.where(isNull, "1", strValues).astype(np.float64)
+        return dsids, values
+
+    def _snapshot_path(self, filePath: str) -> str:
+        with open(filePath, "rb") as xsFile:
+            digest = hashlib.sha1(xsFile.read()).hexdigest()
+        return os.path.join(str(self.cacheDir), f"xs_{digest}.npz")
+
+    def _read_file(self, filePath: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Parses the file or loads it from the snapshot cache"""
+        if self.cacheDir is None:
+            return self._parse_file(filePath)
+
+        snapshotPath = self._snapshot_path(filePath)
+        if os.path.exists(snapshotPath):
+            log.debug(f"Loading {filePath} from snapshot {snapshotPath}")
+            with np.load(snapshotPath, allow_pickle=False) as snapshot:
+                return snapshot["dsids"], snapshot["values"]
+
+        dsids, values = self._parse_file(filePath)
+        os.makedirs(self.cacheDir, exist_ok=True)
+        # write to temporary file first so that concurrent jobs
+        # never read partially written snapshot
+        tmpPath = f"{snapshotPath}.{os.getpid()}.tmp.npz"
+        np.savez(tmpPath, dsids=dsids, values=values)
+        os.replace(tmpPath, snapshotPath)
+        return dsids, values
+
+    def add_file(self, filePath: str) -> None:
+        dsids, values = self._read_file(filePath)
+        oldDSIDs, oldValues = self._columns()
+
+        allDSIDs = np.concatenate((oldDSIDs, dsids))
+        allValues = np.concatenate((oldValues, values))
+        allXS = allValues[:, 0] * allValues[:, 1] * allValues[:, 2]
+
+        # first occurence is kept, so already added DSIDs take precedence
+        uniqueDSIDs, first, inverse, counts = np.unique(
+            allDSIDs, return_index=True, return_inverse=True, return_counts=True
+        )
+        # the same DSID has to have the same XS everywhere
+        conflicts = allXS != allXS[first][inverse]
+        if np.any(conflicts):
+            conflictDSIDs = np.unique(allDSIDs[conflicts])
+            log.error(
+                f"DSIDs {', '.join(conflictDSIDs.tolist())} already in XSsection "
+                "and have different XS!"
+            )
+            raise RuntimeError
+        nDuplicates = int(np.sum(counts > 1))
+        if nDuplicates:
+            log.warning(f"{nDuplicates} DSIDs from {filePath} already in XSsection, skipping!")
+
+        self._dsids = uniqueDSIDs
+        self._values = allValues[first]
+        self._rows = None
+        if self._XSsection is not None:
+            # keep the same dict, it can be referenced by the user
+            for dsid, values in zip(dsids.tolist(), values.tolist()):
+                if dsid not in self._XSsection:
+                    self._XSsection[dsid] = self._make_xs(*values)
+            # columns are already up to date
+            self._builtAt = _modifications
+
+    def _find(self, dsids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns positions of DSIDs and mask of those which were found"""
+        if len(self._dsids) == 0:
+            return np.zeros(len(dsids), dtype=int), np.zeros(len(dsids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self._dsids, dsids), len(self._dsids) - 1)
+        return positions, self._dsids[positions] == dsids
 
     def get_xs(self, dsid: str, oneIfMissing: bool = False) -> float:
-        if dsid not in self.XSsection.keys():
+        if self._XSsection is not None:
+            xs = self._XSsection.get(dsid)
+            value = None if xs is None else xs.get_xs()
+        else:
+            if self._rows is None:
+                self._rows = {d: i for i, d in enumerate(self._dsids.tolist())}
+            row = self._rows.get(dsid)
+            if row is not None:
+                XS, kFactor, filtEff = self._values[row].tolist()
+                value = XS * kFactor * filtEff
+            else:
+                value = None
+        if value is None:
             if oneIfMissing:
                 log.warning(f"DSID {dsid} not in any of added files!")
                 log.warning("Returning 1")
                 return 1
             log.error(f"DSID {dsid} not in any of added files!")
             raise RuntimeError
-        return self.XSsection[dsid].get_xs()
+        return value
+
+    def get_xs_many(self, dsids: List[str], oneIfMissing: bool = False) -> np.ndarray:
+        """Returns cross-sections (including k-factor and filter efficiency)
+        of many DSIDs at once
+
+        Arguments:
+            dsids (``List[str]``): DSIDs to look up
+            oneIfMissing (``bool``): if True, returns 1 for DSIDs
+                not in any of added files, otherwise raises error
+        """
+        dsidArray = np.asarray(dsids, dtype=str)
+        self._columns()
+        positions, found = self._find(dsidArray)
+        if not np.all(found):
+            missing = ", ".join(dsidArray[~found].tolist())
+            if not oneIfMissing:
+                log.error(f"DSID {missing} not in any of added files!")
+                raise RuntimeError
+            log.warning(f"DSID {missing} not in any of added files!")
+            log.warning("Returning 1")
+
+        if len(self._dsids) == 0:
+            return np.ones(len(dsidArray))
+        values = self._values[positions]
+        return np.where(found, values[:, 0] * values[:, 1] * values[:, 2], 1.0)